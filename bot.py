@@ -1,11 +1,9 @@
-from abc import ABC, abstractmethod
 import asyncio
 import os
-import json
 import shutil
 import sys
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any, Set
+from datetime import datetime
+from typing import Optional, Dict, Any, Set
 import multiprocessing
 from multiprocessing import Process
 
@@ -13,12 +11,16 @@ from loguru import logger
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+try:
+    import psutil
+except ImportError:  # psutil нужен только для проверки lock-файла
+    psutil = None
 
 # Импортируем наши модули
 from utils.config import Config
-from utils.bot_state import BotContext, IdleState, RunningState
+from utils.bot_state import BotContext, time_to_minutes
 from utils.keyboard_factory import KeyboardFactory
-from database.repository import Repository, DatabaseConnectionPool
+from database.repository import Repository
 from services.chat_cache import ChatCacheService, CacheObserver, ChatInfo
 from commands.commands import (
     StartCommand,
@@ -29,10 +31,33 @@ from commands.commands import (
     TestMessageCommand,
     FindLastMessageCommand,
 )
-from utils.message_utils import find_latest_message as find_msg
 
-import multiprocessing
-from multiprocessing import Process
+
+def _build_single_back_button(text: str, callback_data: str) -> Any:
+    """Клавиатура из одной кнопки возврата"""
+    kb = InlineKeyboardBuilder()
+    kb.button(text=text, callback_data=callback_data)
+    return kb.as_markup()
+
+
+_BACK_TO_CHANNELS_MARKUP = _build_single_back_button("Назад к каналам", "channels")
+
+# Предустановленные слоты расписания: (подпись кнопки, callback_data) считаются один раз
+_PRESET_TIME_SLOTS = tuple(
+    (display, f"set_time_{start}_{end}")
+    for display, start, end in (
+        ("🌅 06:00 - 08:00", "06:00", "08:00"),
+        ("🌄 08:00 - 10:00", "08:00", "10:00"),
+        ("🌞 10:00 - 12:00", "10:00", "12:00"),
+        ("☀️ 12:00 - 14:00", "12:00", "14:00"),
+        ("🌤️ 14:00 - 16:00", "14:00", "16:00"),
+        ("🌇 16:00 - 18:00", "16:00", "18:00"),
+        ("🌆 18:00 - 20:00", "18:00", "20:00"),
+        ("🌃 20:00 - 22:00", "20:00", "22:00"),
+        ("🌙 22:00 - 00:00", "22:00", "00:00"),
+        ("🦉 00:00 - 02:00", "00:00", "02:00"),
+    )
+)
 
 class BotManager:
     """Manages multiple bot instances"""
@@ -144,11 +169,17 @@ class ForwarderBot(CacheObserver):
         self.bot_id = "main"  # Identifier for the main bot
         self.child_bots = []  # Track spawned bots
         self.awaiting_clone_token = None  # Track if waiting for clone token
-        # Словарь для хранения ID закрепленных сообщений в чатах
-        self.pinned_messages = {}
+        # ID закрепленных сообщений по чатам - общий словарь с контекстом, обработчики обновляют его напрямую
+        self.pinned_messages = self.context.pinned_messages
         self.awaiting_custom_start_time = None
         self.awaiting_custom_end_time = None
+        # Пошаговое добавление слота расписания: канал -> время начала -> время окончания
+        self.awaiting_channel_for_schedule = None
+        self.awaiting_start_time = None
+        self.awaiting_end_time = None
         self.temp_schedule_data = {}
+        # Фоновые задачи (отложенное открепление и т.п.), держим ссылки до завершения
+        self._background_tasks: Set[asyncio.Task] = set()
         # Add this line to create the keyboard factory
         self.keyboard_factory = KeyboardFactory()
         
@@ -252,6 +283,7 @@ class ForwarderBot(CacheObserver):
             self.temp_schedule["start_time"],
             self.temp_schedule["end_time"]
         )
+        self.context.reschedule()
 
         kb = InlineKeyboardBuilder()
         kb.button(text="Назад к расписанию", callback_data="manage_schedule")
@@ -314,6 +346,7 @@ class ForwarderBot(CacheObserver):
 
             slot = schedules[slot_index]
             await Repository.remove_schedule(slot["channel_id"], slot["start_time"], slot["end_time"])
+            self.context.reschedule()
 
             channel_name = await self._get_channel_name(slot["channel_id"])
             
@@ -333,12 +366,6 @@ class ForwarderBot(CacheObserver):
         
         await callback.answer()
         
-    def _validate_time(self, time_str: str) -> bool:
-        try:
-            hours, minutes = map(int, time_str.split(":"))
-            return 0 <= hours < 24 and 0 <= minutes < 60
-        except ValueError:
-            return False
     async def _perform_bot_clone(self, new_token: str, clone_dir: str, progress_msg=None):
         """Perform the actual bot cloning"""
         try:
@@ -722,7 +749,7 @@ class ForwarderBot(CacheObserver):
         if not self.is_admin(message.from_user.id):  # ИСПРАВЛЕНО
             return
         
-        if not hasattr(self, 'awaiting_clone_token') or self.awaiting_clone_token != message.from_user.id:
+        if self.awaiting_clone_token != message.from_user.id:
             return
         
         new_token = message.text.strip()
@@ -826,7 +853,7 @@ class ForwarderBot(CacheObserver):
         # Обработчики команд администратора
         commands = {
             "start": StartCommand(
-                isinstance(self.context.state, RunningState)
+                self.context.is_running
             ),
             "help": HelpCommand(),
             "setlast": SetLastMessageCommand(self.bot),
@@ -849,14 +876,12 @@ class ForwarderBot(CacheObserver):
         
         self.dp.message.register(
             self.handle_custom_start_time,
-            lambda message: hasattr(self, 'awaiting_custom_start_time') and 
-            self.awaiting_custom_start_time == message.from_user.id
+            lambda message: self.awaiting_custom_start_time == message.from_user.id
         )
 
         self.dp.message.register(
             self.handle_custom_end_time,
-            lambda message: hasattr(self, 'awaiting_custom_end_time') and 
-            self.awaiting_custom_end_time == message.from_user.id
+            lambda message: self.awaiting_custom_end_time == message.from_user.id
         )
         # Регистрация прямой команды для добавления канала
         self.dp.message.register(
@@ -894,8 +919,7 @@ class ForwarderBot(CacheObserver):
         }
         self.dp.message.register(
             self.clone_bot_submit,
-                lambda message: hasattr(self, 'awaiting_clone_token') and 
-                self.awaiting_clone_token == message.from_user.id
+                lambda message: self.awaiting_clone_token == message.from_user.id
             )
         
         self.dp.callback_query.register(self.manage_schedule, lambda c: c.data == "manage_schedule")
@@ -906,18 +930,15 @@ class ForwarderBot(CacheObserver):
         # Обработчики для ввода данных при добавлении слота
         self.dp.message.register(
             self.add_schedule_channel_submit,
-            lambda message: hasattr(self, 'awaiting_channel_for_schedule') and 
-            self.awaiting_channel_for_schedule == message.from_user.id
+            lambda message: self.awaiting_channel_for_schedule == message.from_user.id
         )
         self.dp.message.register(
             self.add_schedule_start_time_submit,
-            lambda message: hasattr(self, 'awaiting_start_time') and 
-            self.awaiting_start_time == message.from_user.id
+            lambda message: self.awaiting_start_time == message.from_user.id
         )
         self.dp.message.register(
             self.add_schedule_end_time_submit,
-            lambda message: hasattr(self, 'awaiting_end_time') and 
-            self.awaiting_end_time == message.from_user.id
+            lambda message: self.awaiting_end_time == message.from_user.id
         )
         # Регистрируем обработчики с определенным порядком, чтобы избежать конфликтов
         for prefix, handler in callbacks.items():
@@ -978,24 +999,8 @@ class ForwarderBot(CacheObserver):
             kb = InlineKeyboardBuilder()
             
             # Предустановленные интервалы по 2 часа
-            time_slots = [
-                ("🌅 06:00 - 08:00", "06:00", "08:00"),
-                ("🌄 08:00 - 10:00", "08:00", "10:00"),
-                ("🌞 10:00 - 12:00", "10:00", "12:00"),
-                ("☀️ 12:00 - 14:00", "12:00", "14:00"),
-                ("🌤️ 14:00 - 16:00", "14:00", "16:00"),
-                ("🌇 16:00 - 18:00", "16:00", "18:00"),
-                ("🌆 18:00 - 20:00", "18:00", "20:00"),
-                ("🌃 20:00 - 22:00", "20:00", "22:00"),
-                ("🌙 22:00 - 00:00", "22:00", "00:00"),
-                ("🦉 00:00 - 02:00", "00:00", "02:00"),
-            ]
-            
-            for display, start, end in time_slots:
-                kb.button(
-                    text=display,
-                    callback_data=f"set_time_{start}_{end}"
-                )
+            for display, callback_data in _PRESET_TIME_SLOTS:
+                kb.button(text=display, callback_data=callback_data)
             
             kb.button(text="⚙️ Другое (ввести вручную)", callback_data="custom_time")
             kb.button(text="◀️ Назад", callback_data="add_schedule_start")
@@ -1104,6 +1109,7 @@ class ForwarderBot(CacheObserver):
                     return
 
             await Repository.add_schedule(channel_id, start_time, end_time)
+            self.context.reschedule()
             
             channel_name = await self._get_channel_name(channel_id)
             
@@ -1157,10 +1163,6 @@ class ForwarderBot(CacheObserver):
 
     def _times_overlap(self, start1: str, end1: str, start2: str, end2: str) -> bool:
         """Проверка пересечения временных интервалов"""
-        def time_to_minutes(time_str):
-            h, m = map(int, time_str.split(':'))
-            return h * 60 + m
-        
         s1, e1 = time_to_minutes(start1), time_to_minutes(end1)
         s2, e2 = time_to_minutes(start2), time_to_minutes(end2)
         
@@ -1203,19 +1205,6 @@ class ForwarderBot(CacheObserver):
             logger.error(f"Ошибка в manage_schedule: {e}")
             await callback.answer(f"Ошибка: {e}")
 
-    async def _start_rotation_task(self, interval: int = 7200) -> None:
-            """Запускает ротацию закрепленных сообщений с указанным интервалом"""
-            self.state = RunningState(self, interval)
-            await self._notify_admins(f"Бот начал ротацию закрепленных сообщений с интервалом {interval//60} минут")
-        
-    async def rotate_now(self) -> bool:
-        """Немедленно выполняет ротацию на следующий канал"""
-        if not isinstance(self.state, RunningState):
-            logger.warning("Нельзя выполнить немедленную ротацию: бот не запущен")
-            return False
-        
-        return await self.state._rotate_to_next_channel()
-
     async def test_pin_handler(self, callback: types.CallbackQuery):
         """Обработчик для тестирования функции закрепления сообщений"""
         if not self.is_admin(callback.from_user.id):
@@ -1227,7 +1216,7 @@ class ForwarderBot(CacheObserver):
             await callback.answer("Неверный формат данных")
             return
                 
-        chat_id = int(parts[2])
+        chat_id = parts[2]
         
         try:
             # Проверяем права бота в чате
@@ -1270,8 +1259,8 @@ class ForwarderBot(CacheObserver):
             )
             
             # Сохраняем ID закрепленного сообщения
-            self.pinned_messages[str(chat_id)] = test_message.message_id
-            await Repository.save_pinned_message(str(chat_id), test_message.message_id)
+            self.pinned_messages[chat_id] = test_message.message_id
+            await Repository.save_pinned_message(chat_id, test_message.message_id)
             
             await callback.message.edit_text(
                 f"✅ Тестовое сообщение успешно отправлено и закреплено в чате {chat_id}",
@@ -1280,16 +1269,11 @@ class ForwarderBot(CacheObserver):
                 )
             )
             
-            # Через 5 секунд открепляем сообщение для завершения теста
-            await asyncio.sleep(5)
-            
-            try:
-                await self.bot.unpin_chat_message(
-                    chat_id=chat_id,
-                    message_id=test_message.message_id
-                )
-            except Exception as unpin_error:
-                logger.warning(f"Не удалось открепить сообщение в чате {chat_id}: {unpin_error}")
+            # Через 5 секунд открепляем сообщение для завершения теста, не удерживая обработчик
+            message_id = test_message.message_id
+            asyncio.get_running_loop().call_later(
+                5, lambda: self._spawn(self._unpin_test_message(chat_id, message_id))
+            )
                 
         except Exception as e:
             await callback.message.edit_text(
@@ -1302,10 +1286,27 @@ class ForwarderBot(CacheObserver):
             
         await callback.answer()
 
+    async def _unpin_test_message(self, chat_id: str, message_id: int) -> None:
+        """Открепление тестового сообщения после завершения проверки"""
+        try:
+            await self.bot.unpin_chat_message(
+                chat_id=chat_id,
+                message_id=message_id
+            )
+        except Exception as unpin_error:
+            logger.warning(f"Не удалось открепить сообщение в чате {chat_id}: {unpin_error}")
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """Запуск фоновой задачи с удержанием ссылки до ее завершения"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
     # Вспомогательный метод для получения информации о чатах
-    async def _fetch_chat_info(self) -> Dict[int, str]:
+    async def _fetch_chat_info(self) -> Dict[str, str]:
         """Вспомогательный метод для получения информации о чатах"""
-        chats = await Repository.get_target_chats()
+        chats = await self.context.get_target_chats()
         chat_info = {}
         
         for chat_id in chats:
@@ -1330,68 +1331,16 @@ class ForwarderBot(CacheObserver):
         if not self.is_admin(callback.from_user.id):
             return
 
-        if isinstance(self.context.state, IdleState):
+        if not self.context.is_running:
             await callback.message.edit_text("🔄 Запуск ротации закрепленных сообщений...")
-            await self.context.state.start()
-        else:
-            await self.context.state.stop()
+        running = await self.context.toggle()
 
         await callback.message.edit_text(
-            f"Ротация закрепленных сообщений {'запущена' if isinstance(self.context.state, RunningState) else 'остановлена'}!",
-            reply_markup=KeyboardFactory.create_main_keyboard(
-                isinstance(self.context.state, RunningState)
-            )
+            f"Ротация закрепленных сообщений {'запущена' if running else 'остановлена'}!",
+            reply_markup=KeyboardFactory.create_main_keyboard(running)
         )
         await callback.answer()
 
-
-    async def get_chat_info(self, bot: Bot, chat_id: int) -> Optional[ChatInfo]:
-        """Get chat info from cache or fetch from API"""
-        now = datetime.now().timestamp()
-        
-        # Check cache first
-        if chat_id in self._cache:
-            chat_info = self._cache[chat_id]
-            if now - chat_info.last_updated < self._config.cache_ttl:
-                return chat_info
-
-        try:
-            # Fetch fresh data
-            chat = await bot.get_chat(chat_id)
-            
-            # Попытка получить количество участников
-            member_count = None
-            try:
-                member_count = await bot.get_chat_member_count(chat_id)
-            except Exception as e:
-                from loguru import logger
-                logger.warning(f"Не удалось получить количество участников для чата {chat_id}: {e}")
-            
-            info = ChatInfo(
-                id=chat_id,
-                title=chat.title or f"Чат {chat_id}",  # Fallback если название не удалось получить
-                type=chat.type,
-                member_count=member_count,
-                last_updated=now
-            )
-            
-            # Update cache
-            self._cache[chat_id] = info
-            
-            # Notify observers
-            await self._notify_observers(chat_id, info)
-            
-            # Cleanup old entries if cache is too large
-            if len(self._cache) > self._config.max_cache_size:
-                oldest = min(self._cache.items(), key=lambda x: x[1].last_updated)
-                del self._cache[oldest[0]]
-            
-            return info
-        except Exception as e:
-            from loguru import logger
-            logger.error(f"Error fetching chat info for {chat_id}: {e}")
-            return None
-
     async def add_channel_prompt(self, callback: types.CallbackQuery):
         """Улучшенное приглашение для добавления канала"""
         if not self.is_admin(callback.from_user.id):
@@ -1414,7 +1363,7 @@ class ForwarderBot(CacheObserver):
     async def find_latest_message(self, channel_id: str) -> Optional[int]:
         """Метод-обертка для поиска последнего доступного сообщения в канале"""
         last_id = await Repository.get_last_message(channel_id)
-        return await find_msg(self.bot, channel_id, self.config.owner_id, last_id)
+        return await self.context.find_latest_message(channel_id, last_id)
 
     async def add_channel_input(self, callback: types.CallbackQuery):
         """Обработчик ввода ID/username канала"""
@@ -1457,72 +1406,53 @@ class ForwarderBot(CacheObserver):
             member = await self.bot.get_chat_member(chat.id, bot_id)
             
             if member.status != "administrator":
-                kb = InlineKeyboardBuilder()
-                kb.button(text="Назад к каналам", callback_data="channels")
-                
                 await progress_msg.edit_text(
                     "⚠️ Бот должен быть администратором канала.\n"
                     "Пожалуйста, добавьте бота как администратора и попробуйте снова.",
-                    reply_markup=kb.as_markup()
+                    reply_markup=_BACK_TO_CHANNELS_MARKUP
                 )
                 return
             
             if self.config.add_source_channel(str(chat.id)):
+                self.context.invalidate_config_cache()
                 await progress_msg.edit_text(f"✅ Добавлен канал: {chat.title} ({chat.id})\n\n🔍 Теперь ищу последнее сообщение...")
                 
                 try:
                     latest_id = await self.find_latest_message(str(chat.id))
                     
                     if latest_id:
-                        await Repository.save_last_message(str(chat.id), latest_id)
-                        
-                        kb = InlineKeyboardBuilder()
-                        kb.button(text="Назад к каналам", callback_data="channels")
-                        
                         await progress_msg.edit_text(
                             f"✅ Добавлен канал: {chat.title} ({chat.id})\n"
                             f"✅ Найдено и сохранено последнее сообщение (ID: {latest_id})",
-                            reply_markup=kb.as_markup()
+                            reply_markup=_BACK_TO_CHANNELS_MARKUP
                         )
                     else:
-                        kb = InlineKeyboardBuilder()
-                        kb.button(text="Назад к каналам", callback_data="channels")
-                        
                         await progress_msg.edit_text(
                             f"✅ Добавлен канал: {chat.title} ({chat.id})\n"
                             f"⚠️ Не удалось найти валидные сообщения. Будет использоваться следующее сообщение в канале.",
-                            reply_markup=kb.as_markup()
+                            reply_markup=_BACK_TO_CHANNELS_MARKUP
                         )
                 except Exception as e:
                     logger.error(f"Error finding latest message: {e}")
                     
-                    kb = InlineKeyboardBuilder()
-                    kb.button(text="Назад к каналам", callback_data="channels")
-                    
                     await progress_msg.edit_text(
                         f"✅ Добавлен канал: {chat.title} ({chat.id})\n"
                         f"⚠️ Ошибка при поиске последнего сообщения.",
-                        reply_markup=kb.as_markup()
+                        reply_markup=_BACK_TO_CHANNELS_MARKUP
                     )
             else:
-                kb = InlineKeyboardBuilder()
-                kb.button(text="Назад к каналам", callback_data="channels")
-                
                 await progress_msg.edit_text(
                     f"⚠️ Канал {chat.title} уже настроен.",
-                    reply_markup=kb.as_markup()
+                    reply_markup=_BACK_TO_CHANNELS_MARKUP
                 )
         except Exception as e:
-            kb = InlineKeyboardBuilder()
-            kb.button(text="Назад к каналам", callback_data="channels")
-            
             await progress_msg.edit_text(
                 f"❌ Ошибка доступа к каналу: {e}\n\n"
                 "Убедитесь что:\n"
                 "• ID/username канала указан правильно\n"
                 "• Бот является участником канала\n"
                 "• Бот является администратором канала",
-                reply_markup=kb.as_markup()
+                reply_markup=_BACK_TO_CHANNELS_MARKUP
             )
             logger.error(f"Failed to add channel {channel}: {e}")
 
@@ -1537,11 +1467,11 @@ class ForwarderBot(CacheObserver):
             return
         
         try:
-            chat_id = int(callback.data.split("_")[1])
+            chat_id = callback.data.split("_")[1]
             
             # Перед удалением пробуем открепить сообщение, если оно есть
             try:
-                pinned_message_id = await Repository.get_pinned_message(str(chat_id))
+                pinned_message_id = (await self.context.get_pinned_map()).get(chat_id)
                 if pinned_message_id:
                     try:
                         await self.bot.unpin_chat_message(
@@ -1554,12 +1484,12 @@ class ForwarderBot(CacheObserver):
                 logger.warning(f"Ошибка при получении закрепленного сообщения для чата {chat_id}: {e}")
             
             await Repository.remove_target_chat(chat_id)
-            await Repository.delete_pinned_message(str(chat_id))
+            self.context.invalidate_target_chats()
+            await Repository.delete_pinned_message(chat_id)
             self.cache_service.remove_from_cache(chat_id)
             
             # Удаляем запись из словаря закрепленных сообщений
-            if str(chat_id) in self.pinned_messages:
-                del self.pinned_messages[str(chat_id)]
+            self.pinned_messages.pop(chat_id, None)
             
             await self.list_chats(callback)
             await callback.answer("Чат удален!")
@@ -1575,7 +1505,7 @@ class ForwarderBot(CacheObserver):
         await callback.message.edit_text("🔄 Загрузка списка чатов...")
         
         try:
-            chats = await Repository.get_target_chats()
+            chats = await self.context.get_target_chats()
             logger.info(f"Получено {len(chats)} чатов из базы данных: {chats}")
             
             chat_info = {}
@@ -1612,16 +1542,16 @@ class ForwarderBot(CacheObserver):
                     "2. Бот является администратором в исходных каналах"
                 )
                 markup = KeyboardFactory.create_main_keyboard(
-                    isinstance(self.context.state, RunningState),
+                    self.context.is_running,
                 )
             else:
                 text = "📡 Целевые чаты:\n\n"
                 
                 # Получаем информацию о закрепленных сообщениях
-                pinned_messages = await Repository.get_all_pinned_messages()
+                pinned_messages = await self.context.get_pinned_map()
                 
                 for chat_id, title in chat_info.items():
-                    has_pinned = str(chat_id) in pinned_messages
+                    has_pinned = chat_id in pinned_messages
                     pin_status = "📌" if has_pinned else "🔴"
                     
                     # Добавляем индикатор для недоступных чатов
@@ -1644,7 +1574,7 @@ class ForwarderBot(CacheObserver):
             await callback.message.edit_text(
                 f"❌ Ошибка при загрузке списка чатов: {e}",
                 reply_markup=KeyboardFactory.create_main_keyboard(
-                    isinstance(self.context.state, RunningState),
+                    self.context.is_running,
                 )
             )
         
@@ -1658,7 +1588,7 @@ class ForwarderBot(CacheObserver):
         try:
             text = "Главное меню:"
             markup = KeyboardFactory.create_main_keyboard(
-                isinstance(self.context.state, RunningState),
+                self.context.is_running,
             )
             
             await self.safe_edit_message(callback, text, markup)
@@ -1724,6 +1654,7 @@ class ForwarderBot(CacheObserver):
         channel = callback.data.replace("remove_channel_", "")
         
         if self.config.remove_source_channel(channel):
+            self.context.invalidate_config_cache()
             await callback.answer("Канал успешно удален")
         else:
             await callback.answer("Не удалось удалить канал")
@@ -1738,26 +1669,15 @@ class ForwarderBot(CacheObserver):
                 
         chat_id = str(message.chat.id)
         username = getattr(message.chat, 'username', None)
-        source_channels = self.config.source_channels
-                
-        is_source = False
-        for channel in source_channels:
-            if channel == chat_id or (username and channel.lower() == username.lower()):
-                is_source = True
-                break
                     
-        if not is_source:
-            logger.info(f"Сообщение не из канала-источника: {chat_id}/{username}")
+        if not self.context.is_source_channel(chat_id, username):
+            logger.info("Сообщение не из канала-источника: {}/{}", chat_id, username)
             return
         
-        # ТОЛЬКО сохраняем ID последнего сообщения
-        await Repository.save_last_message(chat_id, message.message_id)
-        logger.info(f"💾 Сохранено сообщение {message.message_id} из канала {chat_id}")
-        
-        # Делегируем обработку сообщения контексту
+        # Делегируем обработку контексту: состояние само сохраняет ID последнего сообщения
         await self.context.handle_message(chat_id, message.message_id)
         
-        logger.info(f"ℹ️ Сообщение {message.message_id} из канала {chat_id} будет обработано только по расписанию")
+        logger.debug("ℹ️ Сообщение {} из канала {} будет обработано только по расписанию", message.message_id, chat_id)
 
     async def handle_chat_member(self, update: types.ChatMemberUpdated):
         """Обработчик добавления/удаления бота из чатов"""
@@ -1765,7 +1685,7 @@ class ForwarderBot(CacheObserver):
         if update.new_chat_member.user.id != self.bot.id:
             return
 
-        chat_id = update.chat.id
+        chat_id = str(update.chat.id)
         old_status = update.old_chat_member.status
         new_status = update.new_chat_member.status
         
@@ -1773,12 +1693,16 @@ class ForwarderBot(CacheObserver):
         
         # Бот был добавлен или получил права администратора
         if new_status in ['member', 'administrator'] and update.chat.type in ['group', 'supergroup']:
-            added = await Repository.add_target_chat(chat_id)
+            added = await Repository.add_target_chat(chat_id, update.chat.type)
+            self.context.invalidate_target_chats()
             self.cache_service.remove_from_cache(chat_id)
             
             if new_status == 'administrator':
                 # Проверяем права бота
                 pin_rights = getattr(update.new_chat_member, 'can_pin_messages', False)
+                if pin_rights:
+                    # Права выданы - больше не пропускаем чат при рассылке
+                    self.context.clear_pin_denied(chat_id)
                 
                 await self._notify_admins(
                     f"🤖 Бот добавлен как администратор в {update.chat.type}: {update.chat.title} ({chat_id})\n"
@@ -1811,24 +1735,20 @@ class ForwarderBot(CacheObserver):
         # Бот был удален или понижен в правах
         elif old_status in ['member', 'administrator'] and new_status not in ['member', 'administrator']:
             # Удаляем информацию о закрепленном сообщении
-            await Repository.delete_pinned_message(str(chat_id))
-            if str(chat_id) in self.pinned_messages:
-                del self.pinned_messages[str(chat_id)]
+            await Repository.delete_pinned_message(chat_id)
+            self.pinned_messages.pop(chat_id, None)
                 
             await Repository.remove_target_chat(chat_id)
+            self.context.invalidate_target_chats()
             self.cache_service.remove_from_cache(chat_id)
             await self._notify_admins(f"⚠️ Бот удален из чата {update.chat.title} ({chat_id})")
             logger.info(f"Бот удален из чата {update.chat.title} ({chat_id})")
     
     async def _notify_admins(self, message: str):
         """Отправка уведомления всем администраторам бота"""
-        for admin_id in self.config.admin_ids:
-            try:
-                await self.bot.send_message(admin_id, message)
-            except Exception as e:
-                logger.error(f"Не удалось уведомить администратора {admin_id}: {e}")
+        await self.context._notify_admins(message)
 
-    async def on_cache_update(self, chat_id: int, info: ChatInfo):
+    async def on_cache_update(self, chat_id: str, info: ChatInfo):
         """Реализация метода из протокола CacheObserver"""
         # В этой реализации мы не делаем ничего при обновлении кэша
         pass
@@ -1841,18 +1761,14 @@ class ForwarderBot(CacheObserver):
             logger.info("База данных инициализирована")
             
             # Восстанавливаем закрепленные сообщения из базы данных
-            pinned_messages = await Repository.get_all_pinned_messages()
-            self.pinned_messages = pinned_messages
-            self.context.pinned_messages = pinned_messages  # Передаем в контекст
+            pinned_messages = await self.context.get_pinned_map()
+            self.pinned_messages = pinned_messages  # Общий словарь с контекстом
             logger.info(f"Загружено {len(pinned_messages)} закрепленных сообщений")
-            
-            # Устанавливаем интервал по умолчанию, если не задан
-            if not await Repository.get_config("rotation_interval"):
-                await Repository.set_config("rotation_interval", "7200")  # 2 часа по умолчанию
-                logger.info("Установлен интервал ротации по умолчанию: 7200 секунд (2 часа)")
+            pin_sources = await self.context.load_pin_sources()
+            logger.info(f"Загружено {pin_sources} источников закрепленных сообщений")
             
             # Проверяем целевые чаты
-            target_chats = await Repository.get_target_chats()
+            target_chats = await self.context.get_target_chats()
             logger.info(f"Загружено {len(target_chats)} целевых чатов из базы данных: {target_chats}")
             
             # Проверяем исходные каналы
@@ -1863,18 +1779,13 @@ class ForwarderBot(CacheObserver):
             logger.info(f"Бот запущен: @{bot_info.username} (ID: {bot_info.id})")
             
             # Уведомляем администраторов о запуске
-            for admin_id in self.config.admin_ids:
-                try:
-                    await self.bot.send_message(
-                        admin_id, 
-                        f"✅ Бот @{bot_info.username} успешно запущен!\n\n"
-                        f"📊 Статистика:\n"
-                        f"• Исходных каналов: {len(self.config.source_channels)}\n"
-                        f"• Целевых чатов: {len(target_chats)}\n"
-                        f"• Закрепленных сообщений: {len(pinned_messages)}"
-                    )
-                except Exception as e:
-                    logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+            await self._notify_admins(
+                f"✅ Бот @{bot_info.username} успешно запущен!\n\n"
+                f"📊 Статистика:\n"
+                f"• Исходных каналов: {len(self.config.source_channels)}\n"
+                f"• Целевых чатов: {len(target_chats)}\n"
+                f"• Закрепленных сообщений: {len(pinned_messages)}"
+            )
             
             logger.info("Бот успешно запущен!")
             
@@ -1896,73 +1807,22 @@ class ForwarderBot(CacheObserver):
                 self.cache_service.remove_observer(self)
                 await self.bot.session.close()
         except Exception as e:
-            logger.critical(f"Критическая ошибка при запуске бота: {e}")
-            import traceback
-            logger.critical(f"Traceback: {traceback.format_exc()}")
+            logger.opt(exception=True).critical(f"Критическая ошибка при запуске бота: {e}")
             raise
 
-# Обновляем класс KeyboardFactory для работы с новым функционалом
-class KeyboardFactory:
-    """Реализация паттерна Factory для создания клавиатур"""
-    
-    @staticmethod
-    def create_main_keyboard(running: bool = False) -> Any:
-        """Create main menu keyboard"""
-        kb = InlineKeyboardBuilder()
-        kb.button(
-            text="🔄 Запустить ротацию" if not running else "⏹ Остановить ротацию",
-            callback_data="toggle_forward"
-        )
-        kb.button(text="⚙️ Управление каналами", callback_data="channels")
-        kb.button(text="🤖 Клонировать бота", callback_data="clone_bot")  # Добавить эту кнопку
-        kb.button(text="👥 Управление клонами", callback_data="manage_clones")  # Добавить эту кнопку
-        kb.button(text="💬 Список целевых чатов", callback_data="list_chats")
-        kb.button(text="📅 Управление расписанием", callback_data="manage_schedule")  # Новая кнопка
-        kb.adjust(2)
-        return kb.as_markup()
-
-    
-
-    @staticmethod
-    def create_chat_list_keyboard(chats: Dict[int, str]) -> Any:
-        """Создание клавиатуры списка чатов с кнопками удаления и тестирования закрепления"""
-        kb = InlineKeyboardBuilder()
-        for chat_id, title in chats.items():
-            kb.button(
-                text=f"📌 Тест закрепления в {title}",
-                callback_data=f"test_pin_{chat_id}"
-            )
-            kb.button(
-                text=f"❌ Удалить {title}",
-                callback_data=f"remove_{chat_id}"
-            )
-        kb.button(text="Назад", callback_data="back_to_main")
-        kb.adjust(1)
-        return kb.as_markup()
-
-    @staticmethod
-    def create_channel_management_keyboard(channels: List[str]) -> Any:
-        """Создание клавиатуры управления каналами"""
-        kb = InlineKeyboardBuilder()
-        kb.button(text="➕ Добавить канал", callback_data="add_channel")
-        
-        # Добавляем кнопки для каждого канала
-        for channel in channels:
-            # Обрезаем имя канала, если оно слишком длинное
-            display_name = channel[:15] + "..." if len(channel) > 18 else channel
-            
-            # Кнопка только для удаления каналов
-            kb.button(
-                text=f"❌ Удалить ({display_name})",
-                callback_data=f"remove_channel_{channel}"
-            )
-        
-        kb.button(text="Назад", callback_data="back_to_main")
-        kb.adjust(1)
-        return kb.as_markup()
-
-            
 # Update the main function to handle cleanup
+def _pid_exists(pid: int) -> bool:
+    """Проверка, что процесс с данным PID жив (psutil, если установлен)"""
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
 async def main():
     """Main entry point with improved error handling and resource cleanup"""
     lock_file = "bot.lock"
@@ -1973,8 +1833,7 @@ async def main():
             with open(lock_file, 'r') as f:
                 pid = int(f.read().strip())
             
-            import psutil
-            if psutil.pid_exists(pid):
+            if _pid_exists(pid):
                 logger.error(f"Another instance is running (PID: {pid})")
                 return
             os.remove(lock_file)
@@ -1995,15 +1854,14 @@ async def main():
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt")
     except Exception as e:
-        logger.error(f"Bot stopped due to error: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.opt(exception=True).error(f"Bot stopped due to error: {e}")
     finally:
         logger.info("Starting cleanup process...")
         try:
             if bot:
                 logger.info("Cleaning up bot resources...")
                 await bot.cleanup()  # Stop all child bots
+                await bot.context.flush_writes()
             
             logger.info("Closing database connections...")
             await Repository.close_db()
@@ -2014,9 +1872,7 @@ async def main():
                 
             logger.info("Cleanup completed successfully")
         except Exception as e:
-            logger.error(f"Error during cleanup: {e}")
-            import traceback
-            logger.error(f"Cleanup traceback: {traceback.format_exc()}")
+            logger.opt(exception=True).error(f"Error during cleanup: {e}")
 
 # Main entry point with proper Windows multiprocessing support
 if __name__ == "__main__":
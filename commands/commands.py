@@ -1,10 +1,11 @@
+from functools import partial
 from aiogram import types
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from loguru import logger
 from .base_command import Command
 from database.repository import Repository
 from utils.keyboard_factory import KeyboardFactory
 from utils.bot_state import IdleState, RunningState
+from utils.message_utils import find_latest_message as find_msg
 from utils.config import Config
 
 
@@ -53,13 +54,14 @@ class SetLastMessageCommand(Command):
             message_id = int(args[2])
             
             try:
-                test_msg = await self.bot.forward_message(
+                await self.bot.forward_message(
                     chat_id=message.from_user.id,
                     from_chat_id=channel_id,
                     message_id=message_id
                 )
                 
-                await Repository.save_last_message(channel_id, message_id)
+                # Ручная установка может и уменьшить сохраненный ID
+                await Repository.set_last_message(channel_id, message_id)
                 await message.answer(f"✅ Сообщение ID {message_id} из канала {channel_id} проверено и сохранено.")
             
             except Exception as e:
@@ -123,7 +125,7 @@ class TestMessageCommand(Command):
             progress_msg = await message.answer(f"🔍 Проверяю сообщение {message_id} в канале {channel_id}...")
             
             try:
-                test_msg = await self.bot.forward_message(
+                await self.bot.forward_message(
                     chat_id=message.from_user.id,
                     from_chat_id=channel_id,
                     message_id=message_id
@@ -149,44 +151,10 @@ class FindLastMessageCommand(Command):
         channel_id = args[1]
         progress_msg = await message.answer(f"🔍 Ищу последнее валидное сообщение в канале {channel_id}...")
         
-        last_messages = await Repository.get_all_last_messages()
-        current_id = None
-        
-        for chan, data in last_messages.items():
-            if chan == channel_id:
-                current_id = data["message_id"]
-                break
-        
-        if not current_id:
-            current_id = 1000
-        
-        valid_id = None
-        checked_count = 0
-        max_check = 100
-
-        for msg_id in range(current_id + 10, current_id - max_check, -1):
-            if msg_id <= 0:
-                break
-
-            checked_count += 1
-            if checked_count % 10 == 0:
-                try:
-                    await progress_msg.edit_text(f"⏳ Проверено {checked_count} сообщений...")
-                except Exception:
-                    pass
-
-            try:
-                msg = await self.bot.forward_message(
-                    chat_id=message.from_user.id,
-                    from_chat_id=channel_id,
-                    message_id=msg_id
-                )
-                valid_id = msg_id
-                break
-            except Exception as e:
-                if "message not found" in str(e).lower():
-                    continue
-                logger.warning(f"Unexpected error checking message {msg_id} in channel {channel_id}: {e}")
+        # Проверочные копии уходят в чат вызвавшего команду и сразу удаляются; экспоненциальный и бинарный поиск
+        current_id = await Repository.get_last_message(channel_id)
+        valid_id = await find_msg(self.bot, channel_id, message.from_user.id, current_id,
+                                  on_found=partial(Repository.save_last_message, channel_id), scan_gaps=True)
 
         try:
             await progress_msg.delete()
@@ -194,11 +162,6 @@ class FindLastMessageCommand(Command):
             pass
 
         if valid_id:
-            await Repository.save_last_message(channel_id, valid_id)
-            await message.answer(
-                f"✅ Найдено валидное сообщение (ID: {valid_id}) в канале {channel_id} после проверки {checked_count} сообщений."
-            )
+            await message.answer(f"✅ Найдено валидное сообщение (ID: {valid_id}) в канале {channel_id}.")
         else:
-            await message.answer(
-                f"❌ Не найдено валидных сообщений в канале {channel_id} после проверки {checked_count} сообщений."
-            )
\ No newline at end of file
+            await message.answer(f"❌ Не найдено валидных сообщений в канале {channel_id}.")
\ No newline at end of file
@@ -1,16 +1,77 @@
 import asyncio
-import weakref
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+import time
+from typing import Optional, List, Dict, Any, Tuple, Set
 import aiosqlite
 from contextlib import asynccontextmanager
 from loguru import logger
 from utils.config import Config
 
+# WAL + synchronous=NORMAL: без fsync на каждый коммит, читатели не блокируют писателя
+_CONNECTION_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=134217728;
+    PRAGMA cache_size=-20000;
+"""
+
+# Hot-path statements: one shared string per query so each connection's sqlite3
+# statement cache (cached_statements) reuses the compiled statement
+_STATEMENT_CACHE_SIZE = 256
+_SQL = {
+    "get_schedules": "SELECT channel_id, start_time, end_time FROM schedule ORDER BY start_time",
+    "get_target_chats": (
+        "SELECT CAST(chat_id AS TEXT) FROM target_chats "
+        "WHERE chat_type IS NULL OR chat_type != 'channel'"
+    ),
+    "insert_target_chat": "INSERT OR IGNORE INTO target_chats (chat_id, chat_type) VALUES (?, ?)",
+    "delete_target_chat": "DELETE FROM target_chats WHERE chat_id = ?",
+    "get_config": "SELECT value FROM config WHERE key = ?",
+    "get_last": "SELECT message_id FROM last_messages WHERE channel_id = ?",
+    # Указатель только растет: поиск, завершившийся после нового поста, не откатит его назад
+    "upsert_last": (
+        "INSERT INTO last_messages (channel_id, message_id, timestamp) VALUES (?, ?, CURRENT_TIMESTAMP) "
+        "ON CONFLICT(channel_id) DO UPDATE SET message_id = MAX(message_id, excluded.message_id), "
+        "timestamp = excluded.timestamp"
+    ),
+    "set_last": (
+        "INSERT INTO last_messages (channel_id, message_id, timestamp) VALUES (?, ?, CURRENT_TIMESTAMP) "
+        "ON CONFLICT(channel_id) DO UPDATE SET message_id = excluded.message_id, timestamp = excluded.timestamp"
+    ),
+    "get_all_pinned": "SELECT chat_id, message_id FROM pinned_messages",
+    "upsert_pinned": (
+        "INSERT OR REPLACE INTO pinned_messages (chat_id, message_id, timestamp) "
+        "VALUES (?, ?, CURRENT_TIMESTAMP)"
+    ),
+    "delete_pinned": "DELETE FROM pinned_messages WHERE chat_id = ?",
+    "insert_stat": "INSERT INTO forward_stats (message_id) VALUES (?)",
+    "upsert_pin_source": (
+        "INSERT OR REPLACE INTO pin_sources (chat_id, channel_id, source_message_id, forwarded_message_id) "
+        "VALUES (?, ?, ?, ?)"
+    ),
+    "get_all_pin_sources": "SELECT chat_id, channel_id, source_message_id, forwarded_message_id FROM pin_sources",
+    "get_processed_slots": "SELECT slot_id FROM processed_slots WHERE day = ?",
+    "insert_processed_slot": "INSERT OR IGNORE INTO processed_slots (day, slot_id) VALUES (?, ?)",
+    "prune_processed_slots": "DELETE FROM processed_slots WHERE day < ?",
+    "clear_processed_slots": "DELETE FROM processed_slots",
+}
+
+
+def _first_column(cursor, row):
+    """Row factory for single-column queries"""
+    return row[0]
+
 class DatabaseConnectionPool:
     """Connection pool manager"""
-    _pool = weakref.WeakSet()
-    _active_connections = []  # Отслеживаем все активные соединения
+    _idle: Optional[asyncio.Queue] = None  # Свободные соединения
+    _active_connections = []  # Отслеживаем все созданные соединения
+    _created = 0  # Учитывает и соединения, которые еще открываются
+    
+    @classmethod
+    def _idle_queue(cls) -> asyncio.Queue:
+        if cls._idle is None:
+            cls._idle = asyncio.Queue()
+        return cls._idle
     
     @classmethod
     async def close_all(cls):
@@ -26,19 +87,13 @@ class DatabaseConnectionPool:
             except Exception as e:
                 logger.error(f"Ошибка при закрытии соединения {id(conn)}: {e}")
         
-        # Также проходим по пулу для надежности
-        for conn in cls._pool:
-            try:
-                await conn.close()
-            except Exception as e:
-                logger.error(f"Ошибка при закрытии соединения из пула: {e}")
-        
-        cls._pool.clear()
-        
         # Для надежности проверяем, что все соединения закрыты
         if cls._active_connections:
             logger.warning(f"Остались незакрытые соединения: {len(cls._active_connections)}")
             cls._active_connections.clear()
+        
+        cls._idle = None
+        cls._created = 0
             
         logger.info("Все соединения с базой данных закрыты")
     
@@ -50,61 +105,171 @@ class DatabaseConnectionPool:
         
         # Получаем максимальное число соединений из конфигурации или используем значение по умолчанию
         max_connections = getattr(config, 'max_db_connections', 5)
+        idle = cls._idle_queue()
         
-        connection = None
-        
-        # Сначала ищем доступное соединение в пуле
-        for conn in cls._pool:
-            if hasattr(conn, 'in_use') and not conn.in_use:
-                connection = conn
-                connection.in_use = True
-                break
-        
-        # Если не нашли свободное соединение, создаем новое, если не превышен лимит
-        if connection is None:
-            if len(cls._active_connections) < max_connections:
+        try:
+            # Сначала берем свободное соединение из пула
+            connection = idle.get_nowait()
+        except asyncio.QueueEmpty:
+            # Если свободных нет, создаем новое, если не превышен лимит
+            if cls._created < max_connections:
+                cls._created += 1
                 try:
-                    connection = await aiosqlite.connect(config.db_path)
-                    connection.in_use = True
-                    cls._pool.add(connection)
-                    cls._active_connections.append(connection)
-                    logger.debug(f"Создано новое соединение {id(connection)}. Всего соединений: {len(cls._active_connections)}")
+                    # Автокоммит: запись не держит неявную транзакцию, пакеты оборачиваются в явный BEGIN
+                    connection = await aiosqlite.connect(
+                        config.db_path, isolation_level=None, cached_statements=_STATEMENT_CACHE_SIZE
+                    )
+                    await connection.executescript(_CONNECTION_PRAGMAS)
                 except Exception as e:
+                    cls._created -= 1
                     logger.error(f"Ошибка при создании соединения: {e}")
                     raise
+                cls._active_connections.append(connection)
+                logger.debug(f"Создано новое соединение {id(connection)}. Всего соединений: {len(cls._active_connections)}")
             else:
-                # Если достигнут лимит, ждем освобождения соединения
-                waiting_start = datetime.now()
+                # Если достигнут лимит, ждем возврата соединения в пул
                 logger.warning(f"Достигнут лимит соединений ({max_connections}). Ожидание свободного соединения...")
-                while True:
-                    await asyncio.sleep(0.1)
-                    for conn in cls._pool:
-                        if hasattr(conn, 'in_use') and not conn.in_use:
-                            connection = conn
-                            connection.in_use = True
-                            waiting_time = (datetime.now() - waiting_start).total_seconds()
-                            logger.info(f"Получено свободное соединение после {waiting_time:.2f} сек ожидания")
-                            break
-                    if connection:
-                        break
-                    # Если ждем слишком долго, выдаем ошибку
-                    if (datetime.now() - waiting_start).total_seconds() > 30:
-                        logger.error("Превышено время ожидания соединения с БД")
-                        raise TimeoutError("Превышено время ожидания соединения с БД")
+                try:
+                    connection = await asyncio.wait_for(idle.get(), timeout=30)
+                except asyncio.TimeoutError:
+                    logger.error("Превышено время ожидания соединения с БД")
+                    raise TimeoutError("Превышено время ожидания соединения с БД")
         
         try:
             yield connection
         finally:
-            if connection:
-                connection.in_use = False
+            # Соединение, закрытое через close_all, в пул не возвращаем
+            if cls._idle is idle:
+                idle.put_nowait(connection)
                 logger.debug(f"Соединение {id(connection)} освобождено")
 
+class DatabaseWriter:
+    """Single writer task: queued writes share one connection and one transaction per batch"""
+    _queue: Optional[asyncio.Queue] = None
+    _task: Optional[asyncio.Task] = None
+    _db: Optional[aiosqlite.Connection] = None
+    _BATCH_SIZE = 64
+    # Одновременные первые записи не должны открыть два соединения и две задачи записи
+    _start_lock = asyncio.Lock()
+    
+    @classmethod
+    async def start(cls) -> None:
+        """Open the writer connection and start the writer task"""
+        async with cls._start_lock:
+            if cls._task and not cls._task.done():
+                return
+            cls._db = await aiosqlite.connect(
+                Config().db_path, isolation_level=None, cached_statements=_STATEMENT_CACHE_SIZE
+            )
+            await cls._db.executescript(_CONNECTION_PRAGMAS)
+            cls._queue = asyncio.Queue()
+            cls._task = asyncio.create_task(cls._writer_loop())
+            logger.debug("Запущена задача записи в базу данных")
+    
+    @classmethod
+    async def stop(cls) -> None:
+        """Flush queued writes, stop the writer task and close its connection"""
+        if cls._task and not cls._task.done():
+            await cls._queue.join()
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+        cls._task = None
+        cls._queue = None
+        if cls._db:
+            await cls._db.close()
+            cls._db = None
+    
+    @classmethod
+    async def write(cls, statements: List[tuple], key: Optional[tuple] = None) -> None:
+        """Queue (sql, params) statements and wait until they are committed.
+        
+        Queued writes with the same key are coalesced: only the latest one is executed, at its own position.
+        If a batch fails, its writes are retried one by one so only the failing write raises.
+        A list of param tuples is executed with executemany.
+        """
+        if cls._queue is None:
+            await cls.start()
+        future = asyncio.get_running_loop().create_future()
+        cls._queue.put_nowait((key, statements, future))
+        await future
+    
+    @classmethod
+    async def _execute(cls, writes: List[List[tuple]]) -> None:
+        """Execute writes in one transaction; rolled back entirely on error"""
+        await cls._db.execute("BEGIN IMMEDIATE")
+        try:
+            for statements in writes:
+                for sql, params in statements:
+                    # Список кортежей параметров - одна пакетная вставка
+                    if isinstance(params, list):
+                        await cls._db.executemany(sql, params)
+                    else:
+                        await cls._db.execute(sql, params)
+            await cls._db.commit()
+        except Exception:
+            await cls._db.rollback()
+            raise
+    
+    @staticmethod
+    def _resolve(futures: List[asyncio.Future], error: Optional[Exception] = None) -> None:
+        """Complete the callers' futures with the write's outcome"""
+        for future in futures:
+            if not future.done():
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
+    
+    @classmethod
+    async def _writer_loop(cls) -> None:
+        queue = cls._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < cls._BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            # Последняя запись по ключу вытесняет более ранние из той же пачки и встает на свое место
+            # в очереди, чтобы не опередить записи, поставленные между ними
+            pending: Dict[Any, Tuple[List[tuple], List[asyncio.Future]]] = {}
+            for item in batch:
+                key = item[0] if item[0] is not None else id(item)
+                _, futures = pending.pop(key, (None, []))
+                pending[key] = (item[1], futures + [item[2]])
+            
+            try:
+                await cls._execute([statements for statements, _ in pending.values()])
+                for _, futures in pending.values():
+                    cls._resolve(futures)
+            except Exception as e:
+                # Пачка откачена целиком: повторяем записи по одной, чтобы ошибку получила только виновная
+                logger.error(f"Ошибка при пакетной записи в базу данных ({len(batch)} операций), повтор по одной: {e}")
+                for statements, futures in pending.values():
+                    try:
+                        await cls._execute([statements])
+                        cls._resolve(futures)
+                    except Exception as item_error:
+                        logger.error(f"Ошибка при записи в базу данных: {item_error}")
+                        cls._resolve(futures, item_error)
+            
+            for _ in batch:
+                queue.task_done()
+
 class Repository:
     """Repository pattern implementation for database operations"""
     
+    # Write-through cache: (table, key) -> (stored_at, value); config entries expire after _CONFIG_TTL
+    _cache: Dict[tuple, tuple] = {}
+    _CONFIG_TTL = 60
+    # Bumped on every schedule change so in-memory schedule caches know to refetch
+    _schedules_version = 0
+    
     @staticmethod
     async def close_db() -> None:
         """Close all database connections"""
+        await DatabaseWriter.stop()
         await DatabaseConnectionPool.close_all()
     
     @staticmethod
@@ -122,7 +287,8 @@ class Repository:
                     -- Целевые чаты для пересылки
                     CREATE TABLE IF NOT EXISTS target_chats (
                         chat_id INTEGER PRIMARY KEY,
-                        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        chat_type TEXT
                     );
                     
                     -- Последние сообщения из каналов
@@ -139,6 +305,21 @@ class Repository:
                         timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     );
                     
+                    -- Источник закрепленного сообщения в каждом чате
+                    CREATE TABLE IF NOT EXISTS pin_sources (
+                        chat_id TEXT PRIMARY KEY,
+                        channel_id TEXT NOT NULL,
+                        source_message_id INTEGER NOT NULL,
+                        forwarded_message_id INTEGER NOT NULL
+                    );
+                    
+                    -- Слоты расписания, уже обработанные за день
+                    CREATE TABLE IF NOT EXISTS processed_slots (
+                        day TEXT NOT NULL,
+                        slot_id INTEGER NOT NULL,
+                        PRIMARY KEY (day, slot_id)
+                    );
+                    
                     -- Статистика пересылок
                     CREATE TABLE IF NOT EXISTS forward_stats (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -169,8 +350,14 @@ class Repository:
                     CREATE INDEX IF NOT EXISTS idx_schedule_times ON schedule(start_time, end_time);
                     CREATE INDEX IF NOT EXISTS idx_schedule_channel ON schedule(channel_id);
                 """)
+                # Базы, созданные до появления chat_type, дополняем колонкой
+                async with db.execute("PRAGMA table_info(target_chats)") as cursor:
+                    columns = {row[1] for row in await cursor.fetchall()}
+                if "chat_type" not in columns:
+                    await db.execute("ALTER TABLE target_chats ADD COLUMN chat_type TEXT")
                 await db.commit()
-                logger.info("✅ База данных инициализирована успешно")
+            await DatabaseWriter.start()
+            logger.info("✅ База данных инициализирована успешно")
         except Exception as e:
             logger.error(f"❌ Ошибка при инициализации базы данных: {e}")
             raise
@@ -184,18 +371,29 @@ class Repository:
                     (channel_id, start_time, end_time)
                 )
                 await db.commit()
+                Repository.invalidate_schedules_cache()
                 logger.info(f"✅ Добавлен временной слот для канала {channel_id}: {start_time}-{end_time}")
         except Exception as e:
             logger.error(f"❌ Ошибка при добавлении временного слота: {e}")
             raise
 
+    @staticmethod
+    def invalidate_schedules_cache() -> None:
+        """Mark cached schedules as stale"""
+        Repository._schedules_version += 1
+
+    @staticmethod
+    def get_schedules_version() -> int:
+        """Current schedule version for cache validation"""
+        return Repository._schedules_version
+
     @staticmethod
     async def get_schedules() -> List[Dict[str, Any]]:
         """Получить все временные слоты"""
         try:
             async with DatabaseConnectionPool.get_connection() as db:
                 async with db.execute(
-                    "SELECT channel_id, start_time, end_time FROM schedule ORDER BY start_time"
+                    _SQL["get_schedules"]
                 ) as cursor:
                     results = await cursor.fetchall()
                     schedules = [
@@ -222,26 +420,28 @@ class Repository:
                     (channel_id, start_time, end_time)
                 )
                 await db.commit()
+                Repository.invalidate_schedules_cache()
                 logger.info(f"✅ Удален временной слот для канала {channel_id}: {start_time}-{end_time}")
         except Exception as e:
             logger.error(f"❌ Ошибка при удалении временного слота: {e}")
             raise
     @staticmethod
-    async def get_target_chats() -> List[int]:
-        """Получить список целевых ID чатов"""
+    async def get_target_chats() -> List[str]:
+        """Получить список целевых ID чатов (строками, как ключи pinned_messages)"""
         try:
             async with DatabaseConnectionPool.get_connection() as db:
-                async with db.execute("SELECT chat_id FROM target_chats") as cursor:
-                    result = await cursor.fetchall()
-                    chat_ids = [row[0] for row in result]
-                    logger.debug(f"Получено {len(chat_ids)} целевых чатов из базы данных: {chat_ids}")
+                async with db.execute(_SQL["get_target_chats"]) as cursor:
+                    # Одна колонка: отдаем значения без промежуточных кортежей
+                    cursor.row_factory = _first_column
+                    chat_ids = list(await cursor.fetchall())
+                    logger.debug("Получено {} целевых чатов из базы данных: {}", len(chat_ids), chat_ids)
                     return chat_ids
         except Exception as e:
             logger.error(f"Ошибка при получении целевых чатов: {e}")
             return []
     @staticmethod
-    async def add_target_chat(chat_id: int) -> bool:
-        """Add new target chat and return success status"""
+    async def add_target_chat(chat_id: int, chat_type: Optional[str] = None) -> bool:
+        """Add new target chat (type is stored once at registration) and return success status"""
         try:
             # Проверяем, существует ли уже этот чат
             async with DatabaseConnectionPool.get_connection() as db:
@@ -255,11 +455,8 @@ class Repository:
                     logger.debug(f"Чат {chat_id} уже существует в базе данных")
                     return False
                 
-                await db.execute(
-                    "INSERT INTO target_chats (chat_id) VALUES (?)",
-                    (chat_id,)
-                )
-                await db.commit()
+                # Через очередь записи: порядок с удалением того же чата сохраняется
+                await DatabaseWriter.write([(_SQL["insert_target_chat"], (chat_id, chat_type))])
                 
                 # Проверяем, действительно ли добавлен чат
                 async with db.execute(
@@ -281,28 +478,29 @@ class Repository:
     @staticmethod
     async def remove_target_chat(chat_id: int) -> None:
         """Remove target chat"""
+        Repository._cache.pop(("pinned", str(chat_id)), None)
         try:
-            async with DatabaseConnectionPool.get_connection() as db:
-                await db.execute(
-                    "DELETE FROM target_chats WHERE chat_id = ?",
-                    (chat_id,)
-                )
-                await db.commit()
-                logger.info(f"Удален целевой чат: {chat_id}")
+            await DatabaseWriter.write([(_SQL["delete_target_chat"], (chat_id,))])
+            logger.info(f"Удален целевой чат: {chat_id}")
         except Exception as e:
             logger.error(f"Ошибка при удалении целевого чата {chat_id}: {e}")
 
     @staticmethod
     async def get_config(key: str, default: Optional[str] = None) -> Optional[str]:
         """Get configuration value"""
+        cached = Repository._cache.get(("config", key))
+        if cached and time.monotonic() - cached[0] < Repository._CONFIG_TTL:
+            return cached[1] if cached[1] is not None else default
         try:
             async with DatabaseConnectionPool.get_connection() as db:
                 async with db.execute(
-                    "SELECT value FROM config WHERE key = ?",
+                    _SQL["get_config"],
                     (key,)
                 ) as cursor:
                     row = await cursor.fetchone()
-                    return row[0] if row else default
+                    value = row[0] if row else None
+                    Repository._cache[("config", key)] = (time.monotonic(), value)
+                    return value if value is not None else default
         except Exception as e:
             logger.error(f"Ошибка при получении конфигурации для ключа '{key}': {e}")
             return default
@@ -317,6 +515,7 @@ class Repository:
                     (key, str(value))
                 )
                 await db.commit()
+                Repository._cache[("config", key)] = (time.monotonic(), str(value))
                 logger.debug(f"Установлено значение конфигурации: {key}={value}")
         except Exception as e:
             logger.error(f"Ошибка при установке конфигурации {key}={value}: {e}")
@@ -325,49 +524,123 @@ class Repository:
     async def log_forward(message_id: int) -> None:
         """Log forwarded message"""
         try:
-            async with DatabaseConnectionPool.get_connection() as db:
-                await db.execute(
-                    "INSERT INTO forward_stats (message_id) VALUES (?)",
-                    (message_id,)
-                )
-                await db.commit()
-                logger.debug(f"Залогирована пересылка сообщения {message_id}")
+            await DatabaseWriter.write([
+                (_SQL["insert_stat"], (message_id,))
+            ])
+            logger.debug(f"Залогирована пересылка сообщения {message_id}")
         except Exception as e:
             logger.error(f"Ошибка при логировании пересылки сообщения {message_id}: {e}")
 
     @staticmethod
-    async def save_last_message(channel_id: str, message_id: int) -> None:
-        """Save last message ID for channel"""
+    async def get_processed_slots(day: str) -> Set[int]:
+        """Get slot ids already processed on the given day (YYYY-MM-DD)"""
         try:
             async with DatabaseConnectionPool.get_connection() as db:
-                await db.execute(
-                    """
-                    INSERT OR REPLACE INTO last_messages 
-                    (channel_id, message_id, timestamp) 
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                    """,
-                    (channel_id, message_id)
-                )
-                await db.commit()
-                logger.debug(f"Сохранено последнее сообщение для канала {channel_id}: {message_id}")
+                async with db.execute(_SQL["get_processed_slots"], (day,)) as cursor:
+                    cursor.row_factory = _first_column
+                    return set(await cursor.fetchall())
+        except Exception as e:
+            logger.error(f"Ошибка при получении обработанных слотов за {day}: {e}")
+            return set()
+
+    @staticmethod
+    async def add_processed_slot(day: str, slot_id: int) -> None:
+        """Mark schedule slot as processed on the given day"""
+        try:
+            await DatabaseWriter.write([(_SQL["insert_processed_slot"], (day, slot_id))])
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении обработанного слота {slot_id} за {day}: {e}")
+
+    @staticmethod
+    async def prune_processed_slots(older_than: str) -> None:
+        """Delete processed slot marks for days before older_than"""
+        try:
+            await DatabaseWriter.write([(_SQL["prune_processed_slots"], (older_than,))])
+        except Exception as e:
+            logger.error(f"Ошибка при очистке обработанных слотов: {e}")
+
+    @staticmethod
+    async def clear_processed_slots() -> None:
+        """Forget all processed slot marks"""
+        try:
+            await DatabaseWriter.write([(_SQL["clear_processed_slots"], ())])
+        except Exception as e:
+            logger.error(f"Ошибка при сбросе обработанных слотов: {e}")
+
+    @staticmethod
+    async def save_last_message(channel_id: str, message_id: int) -> None:
+        """Save last message ID for channel unless a newer one is already stored"""
+        try:
+            # Без ключа: слияние оставило бы последнюю запись из очереди, а не наибольший ID
+            await DatabaseWriter.write([(_SQL["upsert_last"], (channel_id, message_id))])
+            # Без кэша значение в БД может оказаться больше - оно прочитается при следующем обращении
+            cached = Repository._cache.get(("last", channel_id))
+            if cached is not None and cached[1] < message_id:
+                Repository._cache[("last", channel_id)] = (time.monotonic(), message_id)
+            logger.debug("Сохранено последнее сообщение для канала {}: {}", channel_id, message_id)
         except Exception as e:
             logger.error(f"Ошибка при сохранении последнего сообщения для канала {channel_id}: {e}")
 
+    @staticmethod
+    async def set_last_message(channel_id: str, message_id: int) -> None:
+        """Overwrite last message ID for channel, even with an older one"""
+        try:
+            await DatabaseWriter.write([(_SQL["set_last"], (channel_id, message_id))])
+            Repository._cache[("last", channel_id)] = (time.monotonic(), message_id)
+            logger.debug("Установлено последнее сообщение для канала {}: {}", channel_id, message_id)
+        except Exception as e:
+            logger.error(f"Ошибка при установке последнего сообщения для канала {channel_id}: {e}")
+
     @staticmethod
     async def get_last_message(channel_id: str) -> Optional[int]:
         """Get last message ID for channel"""
+        cached = Repository._cache.get(("last", channel_id))
+        if cached:
+            return cached[1]
         try:
             async with DatabaseConnectionPool.get_connection() as db:
                 async with db.execute(
-                    "SELECT message_id FROM last_messages WHERE channel_id = ?",
+                    _SQL["get_last"],
                     (channel_id,)
                 ) as cursor:
                     row = await cursor.fetchone()
-                    return row[0] if row else None
+                    if not row:
+                        return None
+                    Repository._cache[("last", channel_id)] = (time.monotonic(), row[0])
+                    return row[0]
         except Exception as e:
             logger.error(f"Ошибка при получении последнего сообщения для канала {channel_id}: {e}")
             return None
 
+    @staticmethod
+    async def get_last_messages(channel_ids: List[str]) -> Dict[str, int]:
+        """Get last message IDs for several channels; cache misses are fetched in one query"""
+        result = {}
+        missing = []
+        for channel_id in channel_ids:
+            cached = Repository._cache.get(("last", channel_id))
+            if cached:
+                result[channel_id] = cached[1]
+            else:
+                missing.append(channel_id)
+        if not missing:
+            return result
+        try:
+            placeholders = ",".join("?" * len(missing))
+            async with DatabaseConnectionPool.get_connection() as db:
+                async with db.execute(
+                    f"SELECT channel_id, message_id FROM last_messages WHERE channel_id IN ({placeholders})",
+                    missing
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            now = time.monotonic()
+            for channel_id, message_id in rows:
+                Repository._cache[("last", channel_id)] = (now, message_id)
+                result[channel_id] = message_id
+        except Exception as e:
+            logger.error(f"Ошибка при получении последних сообщений каналов: {e}")
+        return result
+
     @staticmethod
     async def get_all_last_messages() -> Dict[str, Dict[str, Any]]:
         """Get last message IDs for all channels"""
@@ -402,34 +675,44 @@ class Repository:
     async def save_pinned_message(chat_id: str, message_id: int) -> None:
         """Save pinned message ID for chat"""
         try:
-            async with DatabaseConnectionPool.get_connection() as db:
-                await db.execute(
-                    """
-                    INSERT OR REPLACE INTO pinned_messages 
-                    (chat_id, message_id, timestamp) 
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                    """,
-                    (chat_id, message_id)
-                )
-                await db.commit()
-                logger.debug(f"Сохранено закрепленное сообщение для чата {chat_id}: {message_id}")
+            await DatabaseWriter.write(
+                [(_SQL["upsert_pinned"], (chat_id, message_id))],
+                key=("pinned", chat_id)
+            )
+            Repository._cache[("pinned", chat_id)] = (time.monotonic(), message_id)
+            logger.debug(f"Сохранено закрепленное сообщение для чата {chat_id}: {message_id}")
         except Exception as e:
             logger.error(f"Ошибка при сохранении закрепленного сообщения для чата {chat_id}: {e}")
 
     @staticmethod
-    async def get_pinned_message(chat_id: str) -> Optional[int]:
-        """Get pinned message ID for chat"""
+    async def get_all_pin_sources() -> Dict[str, Tuple[str, int, int]]:
+        """Get (channel_id, source_message_id, forwarded_message_id) of the pin in every chat"""
         try:
             async with DatabaseConnectionPool.get_connection() as db:
-                async with db.execute(
-                    "SELECT message_id FROM pinned_messages WHERE chat_id = ?",
-                    (chat_id,)
-                ) as cursor:
-                    row = await cursor.fetchone()
-                    return row[0] if row else None
+                async with db.execute(_SQL["get_all_pin_sources"]) as cursor:
+                    return {row[0]: (row[1], row[2], row[3]) for row in await cursor.fetchall()}
         except Exception as e:
-            logger.error(f"Ошибка при получении закрепленного сообщения для чата {chat_id}: {e}")
-            return None
+            logger.error(f"Ошибка при получении источников закрепленных сообщений: {e}")
+            return {}
+
+    @staticmethod
+    async def record_forwards(channel_id: str, source_message_id: int, pinned: List[Tuple[str, int]]) -> None:
+        """Save new pinned messages, their source and log the forwards for all chats in one transaction"""
+        if not pinned:
+            return
+        try:
+            await DatabaseWriter.write([
+                (_SQL["upsert_pinned"], pinned),
+                (_SQL["upsert_pin_source"],
+                 [(chat_id, channel_id, source_message_id, forwarded_id) for chat_id, forwarded_id in pinned]),
+                (_SQL["insert_stat"], [(source_message_id,)] * len(pinned)),
+            ])
+            now = time.monotonic()
+            for chat_id, forwarded_id in pinned:
+                Repository._cache[("pinned", chat_id)] = (now, forwarded_id)
+            logger.debug(f"Сохранено {len(pinned)} закрепленных сообщений и залогирована пересылка {source_message_id}")
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении пересылки сообщения {source_message_id}: {e}")
 
     @staticmethod
     async def get_all_pinned_messages() -> Dict[str, int]:
@@ -437,10 +720,9 @@ class Repository:
         try:
             async with DatabaseConnectionPool.get_connection() as db:
                 async with db.execute(
-                    "SELECT chat_id, message_id FROM pinned_messages"
+                    _SQL["get_all_pinned"]
                 ) as cursor:
-                    results = await cursor.fetchall()
-                    return {row[0]: row[1] for row in results}
+                    return dict(await cursor.fetchall())
         except Exception as e:
             logger.error(f"Ошибка при получении всех закрепленных сообщений: {e}")
             return {}
@@ -448,17 +730,27 @@ class Repository:
     @staticmethod
     async def delete_pinned_message(chat_id: str) -> None:
         """Delete pinned message record"""
+        Repository._cache.pop(("pinned", chat_id), None)
         try:
-            async with DatabaseConnectionPool.get_connection() as db:
-                await db.execute(
-                    "DELETE FROM pinned_messages WHERE chat_id = ?",
-                    (chat_id,)
-                )
-                await db.commit()
-                logger.debug(f"Удалена запись о закрепленном сообщении для чата {chat_id}")
+            # Через ту же очередь, что и сохранение: еще не записанный закреп не восстановит строку
+            await DatabaseWriter.write([(_SQL["delete_pinned"], (chat_id,))], key=("pinned", chat_id))
+            logger.debug(f"Удалена запись о закрепленном сообщении для чата {chat_id}")
         except Exception as e:
             logger.error(f"Ошибка при удалении записи о закрепленном сообщении для чата {chat_id}: {e}")
 
+    @staticmethod
+    async def delete_pinned_messages(chat_ids: List[str]) -> None:
+        """Delete pinned message records for several chats in one transaction"""
+        if not chat_ids:
+            return
+        for chat_id in chat_ids:
+            Repository._cache.pop(("pinned", chat_id), None)
+        try:
+            await DatabaseWriter.write([(_SQL["delete_pinned"], [(chat_id,) for chat_id in chat_ids])])
+            logger.debug(f"Удалены записи о закрепленных сообщениях для {len(chat_ids)} чатов")
+        except Exception as e:
+            logger.error(f"Ошибка при удалении записей о закрепленных сообщениях: {e}")
+
     @staticmethod
     async def set_channel_interval(channel1: str, channel2: str, interval_seconds: int) -> None:
         """Set interval between two channels"""
@@ -510,25 +802,22 @@ class Repository:
         """Get forwarding statistics"""
         try:
             async with DatabaseConnectionPool.get_connection() as db:
-                # Get total forwards
-                async with db.execute("SELECT COUNT(*) FROM forward_stats") as cursor:
-                    total = (await cursor.fetchone())[0]
-
-                # Get last forward timestamp
+                # Totals and per-channel last messages in one round-trip;
+                # the LEFT JOIN keeps the totals row when last_messages is empty
                 async with db.execute(
-                    "SELECT timestamp FROM forward_stats ORDER BY timestamp DESC LIMIT 1"
+                    """
+                    SELECT s.total, s.last, lm.channel_id, lm.message_id, lm.timestamp
+                    FROM (SELECT COUNT(*) AS total, MAX(timestamp) AS last FROM forward_stats) AS s
+                    LEFT JOIN last_messages AS lm ON 1
+                    """
                 ) as cursor:
-                    row = await cursor.fetchone()
-                    last = row[0] if row else None
+                    rows = await cursor.fetchall()
 
-                # Get last messages for each channel
-                async with db.execute(
-                    "SELECT channel_id, message_id, timestamp FROM last_messages"
-                ) as cursor:
-                    last_msgs = {
-                        row[0]: {"message_id": row[1], "timestamp": row[2]}
-                        for row in await cursor.fetchall()
-                    }
+                total, last = rows[0][0], rows[0][1]
+                last_msgs = {
+                    row[2]: {"message_id": row[3], "timestamp": row[4]}
+                    for row in rows if row[2] is not None
+                }
 
                 return {
                     "total_forwards": total,
@@ -1,4 +1,4 @@
-from datetime import datetime
+import time
 from typing import Optional, Dict, List, Protocol
 from dataclasses import dataclass
 from aiogram import Bot
@@ -7,22 +7,22 @@ from utils.config import Config
 @dataclass
 class ChatInfo:
     """Data class for storing chat information"""
-    id: int
+    id: str
     title: str
     type: str
     member_count: Optional[int] = None
-    last_updated: float = 0.0
+    last_updated: float = 0.0  # time.monotonic() на момент загрузки
 
 class CacheObserver(Protocol):
     """Protocol for cache update observers"""
-    async def on_cache_update(self, chat_id: int, info: ChatInfo) -> None:
+    async def on_cache_update(self, chat_id: str, info: ChatInfo) -> None:
         """Called when chat info is updated in cache"""
         pass
 
 class ChatCacheService:
     """Chat cache service with observer pattern"""
     _instance = None
-    _cache: Dict[int, ChatInfo] = {}
+    _cache: Dict[str, ChatInfo] = {}
     _observers: List[CacheObserver] = []
     
     def __new__(cls):
@@ -47,7 +47,7 @@ class ChatCacheService:
         if observer in self._observers:
             self._observers.remove(observer)
     
-    async def _notify_observers(self, chat_id: int, info: ChatInfo) -> None:
+    async def _notify_observers(self, chat_id: str, info: ChatInfo) -> None:
         """Notify all observers about cache update"""
         for observer in self._observers:
             try:
@@ -56,9 +56,10 @@ class ChatCacheService:
                 from loguru import logger
                 logger.error(f"Error notifying observer: {e}")
     
-    async def get_chat_info(self, bot: Bot, chat_id: int) -> Optional[ChatInfo]:
+    async def get_chat_info(self, bot: Bot, chat_id: str) -> Optional[ChatInfo]:
         """Get chat info from cache or fetch from API"""
-        now = datetime.now().timestamp()
+        # Монотонные часы: для проверки TTL не нужен datetime и не страшен перевод системного времени
+        now = time.monotonic()
         
         # Check cache first
         if chat_id in self._cache:
@@ -125,6 +126,6 @@ class ChatCacheService:
         """Clear the entire cache"""
         self._cache.clear()
     
-    def remove_from_cache(self, chat_id: int) -> None:
+    def remove_from_cache(self, chat_id: str) -> None:
         """Remove specific chat from cache"""
         self._cache.pop(chat_id, None)
@@ -1,17 +1,73 @@
 # 1. Обновленный файл utils/bot_state.py с полной реализацией BotContext
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Optional, Dict, Set, FrozenSet
+from collections import defaultdict
+from functools import partial
+from dataclasses import dataclass
 import asyncio
+import re
+import time
+import zlib
+from bisect import bisect_right
 from loguru import logger
 from database.repository import Repository
-from datetime import datetime, timedelta
-from aiogram import types, Bot
+from datetime import datetime
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
 from utils.message_utils import find_latest_message as find_msg
-from utils.config import Config
+from utils.rate_limiter import AsyncTokenBucket
+
+# Ошибки Telegram о том, что сообщение не существует (для пересылки/открепления)
+_TG_MISSING_MSG_RE = re.compile(r"message (?:to (?:unpin|forward) )?not found|message[_ ]id[_ ]invalid", re.IGNORECASE)
+
+# Ошибки Telegram об отсутствии у бота прав на закрепление
+_TG_PIN_DENIED_RE = re.compile(r"not enough rights|chat_admin_required|need administrator rights", re.IGNORECASE)
+# Сколько не пытаться работать с чатом, где закрепление запрещено, секунды
+_PIN_DENIED_TTL = 3600
+
+# Исходное сообщение + одна попытка с найденным более новым
+_FORWARD_ATTEMPTS = 2
+
+
+def time_to_minutes(time_str: str) -> int:
+    """Перевод времени "HH:MM" в минуты от начала суток"""
+    hours, minutes = time_str.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _slot_key(channel_id: str, start_minutes: int, end_minutes: int) -> int:
+    """Стабильный между перезапусками целочисленный ID слота: crc32 канала, начало и конец в минутах"""
+    return (zlib.crc32(channel_id.encode()) << 22) | (start_minutes << 11) | end_minutes
+
+
+@dataclass
+class ForwardResult:
+    """Итог пересылки и закрепления в одном чате"""
+    chat_id: str
+    forwarded: bool = False  # Сообщение доставлено (или уже было закреплено ранее)
+    pinned_id: Optional[int] = None  # ID нового закрепленного сообщения
+    source_missing: bool = False  # Исходного сообщения больше нет в канале
+    skipped: bool = False  # Чат пропущен: нет прав на закрепление (это не ошибка рассылки)
+    error: Optional[str] = None
+
+
+async def _retry_after(call, *args, **kwargs):
+    """Вызов Telegram API с одним повтором после ответа 429 (RetryAfter)"""
+    try:
+        return await call(*args, **kwargs)
+    except TelegramRetryAfter as e:
+        logger.warning(f"⏳ Лимит запросов Telegram, повтор через {e.retry_after} с")
+        await asyncio.sleep(e.retry_after)
+        return await call(*args, **kwargs)
+
+async def _save_channel_post(channel_id: str, message_id: int, mode: str) -> None:
+    """Сохранение ID нового сообщения канала; общее для всех состояний"""
+    await Repository.save_last_message(channel_id, message_id)
+    logger.info("💾 Сохранено сообщение {} из канала {} ({})", message_id, channel_id, mode)
 
 class BotState(ABC):
     """Abstract base class for bot states"""
+    __slots__ = ()
     
     @abstractmethod
     async def start(self) -> None:
@@ -28,42 +84,75 @@ class BotState(ABC):
         """Handle message forwarding"""
         pass
 
-class IdleState:
+class IdleState(BotState):
     """Состояние, когда бот не пересылает сообщения"""
+    __slots__ = ("context",)
     
     def __init__(self, bot_context):
         self.context = bot_context
     
     async def start(self) -> None:
         """Запуск работы по расписанию"""
-        self.context.state = RunningState(self.context)
+        running = self.context._running_state
+        self.context._set_state(running)
+        running.resume()
         # Уведомляем администраторов
-        for admin_id in self.context.config.admin_ids:
-            try:
-                await self.context.bot.send_message(admin_id, "🚀 Бот запущен! Работа по расписанию активирована.")
-            except Exception as e:
-                logger.error(f"Не удалось уведомить администратора {admin_id}: {e}")
+        await self.context._notify_admins("🚀 Бот запущен! Работа по расписанию активирована.")
     
     async def stop(self) -> None:
         pass
     
     async def handle_message(self, channel_id: str, message_id: int) -> None:
         """В режиме ожидания только сохраняем сообщения, НЕ пересылаем"""
-        await Repository.save_last_message(channel_id, message_id)
-        logger.info(f"💾 Сохранено сообщение {message_id} из канала {channel_id} (бот остановлен, пересылка отключена)")
+        await _save_channel_post(channel_id, message_id, "бот остановлен, пересылка отключена")
 
 class RunningState(BotState):
     """Состояние, когда бот активно закрепляет сообщения ТОЛЬКО по расписанию"""
+    __slots__ = (
+        "context", "_schedule_task", "_current_active_channel", "_current_pinned_message",
+        "_last_check_date", "_processed_slots", "_check_interval", "_max_sleep",
+        "_error_delay_min", "_error_delay_max", "_schedules_cache", "_slot_infos",
+        "_schedules_cache_ts", "_schedules_cache_ttl", "_schedules_cache_version", "_schedules_lock",
+        "_slot_starts", "_slot_segments", "_slot_max_end", "_active_slot_memo",
+        "_wakeup_event", "_awaiting_channel",
+    )
     
-    def __init__(self, bot_context, auto_forward: bool = False):  # Изменено на False
+    def __init__(self, bot_context):
         self.context = bot_context
         self._schedule_task = None
         self._current_active_channel = None  # Текущий активный канал
         self._current_pinned_message = None  # ID текущего закрепленного сообщения
-        self._last_pin_time = None  # Время последнего закрепления
-        self.auto_forward = auto_forward  # ОТКЛЮЧЕНА автопересылка
         self._last_check_date = None
-        self._processed_slots = set()  # Отслеживание обработанных слотов в текущий день
+        self._processed_slots: Set[int] = set()  # Отслеживание обработанных слотов в текущий день
+        self._check_interval = 60  # Период повторной попытки для необработанного слота, секунды
+        self._max_sleep = 300  # Верхняя граница сна между проверками, секунды
+        self._error_delay_min = 10  # Пауза после ошибки в задаче расписания, удваивается до _error_delay_max
+        self._error_delay_max = 300
+        # Разобранное расписание: (channel_id, start_time, end_time, start_min, end_min, slot_id, crosses_midnight);
+        # slot_id - целое число из _slot_key()
+        self._schedules_cache: Optional[list] = None
+        # Готовые описания слотов (channel_id, slot_id, slot_label, ...) по индексу в _schedules_cache
+        self._slot_infos: list = []
+        self._schedules_cache_ts: float = 0
+        self._schedules_cache_ttl = 300
+        self._schedules_cache_version = -1
+        self._schedules_lock = asyncio.Lock()
+        # Отрезки слотов в минутах суток, отсортированные по началу (слот через полночь - два отрезка)
+        self._slot_starts: list = []
+        self._slot_segments: list = []  # (start_min, end_min, индекс в _schedules_cache)
+        self._slot_max_end: list = []  # Максимальный конец среди отрезков [0..i]
+        self._active_slot_memo: Optional[tuple] = None  # (минута суток, описание слота) последнего поиска
+        self._wakeup_event = asyncio.Event()  # Внеочередная проверка после изменения расписания
+        self._awaiting_channel: Optional[str] = None  # Активный канал, для которого еще нет сохраненного сообщения
+    
+    def resume(self) -> None:
+        """Переход в рабочий режим: сброс состояния прошлого запуска и старт задачи расписания"""
+        self._current_active_channel = None
+        self._current_pinned_message = None
+        self._last_check_date = None
+        self._processed_slots.clear()
+        self._awaiting_channel = None
+        self._wakeup_event.clear()
         self._start_schedule_task()
     
     def _start_schedule_task(self):
@@ -71,157 +160,281 @@ class RunningState(BotState):
         if not self._schedule_task or self._schedule_task.done():
             self._schedule_task = asyncio.create_task(self._schedule_check())
     
+    async def _cancel_schedule_task(self) -> None:
+        """Отмена задачи расписания с ожиданием ее фактического завершения"""
+        task, self._schedule_task = self._schedule_task, None
+        if task and not task.done():
+            task.cancel()
+            # return_exceptions: ошибка внутри задачи не должна прерывать остановку
+            await asyncio.gather(task, return_exceptions=True)
+    
     async def _schedule_check(self):
         """Периодическая проверка расписания с логикой смены дня"""
+        logger.info("🕐 Запущена задача проверки расписания (ТОЛЬКО по времени, без автопересылки)")
+        error_delay = self._error_delay_min
         try:
-            logger.info("🕐 Запущена задача проверки расписания (ТОЛЬКО по времени, без автопересылки)")
             while True:
-                current_date = datetime.now().date()
-                current_time = datetime.now().strftime("%H:%M")
-                
-                # Проверяем, сменился ли день
-                if self._last_check_date != current_date:
-                    logger.info(f"📅 Новый день: {current_date}. Сброс состояния.")
-                    self._current_active_channel = None
-                    self._current_pinned_message = None
-                    self._last_pin_time = None
-                    self._processed_slots.clear()  # Очищаем обработанные слоты
-                    self._last_check_date = current_date
-                
-                # Получаем активный канал для текущего времени
-                active_channel_info = await self._get_active_channel_info()
-                
-                if active_channel_info:
-                    channel_id = active_channel_info["channel_id"]
-                    slot_id = active_channel_info["slot_id"]
+                try:
+                    # Одно чтение часов на тик: и для смены дня, и для поиска слота
+                    now = datetime.now()
+                    current_date = now.date()
+                    
+                    # Проверяем, сменился ли день
+                    if self._last_check_date != current_date:
+                        day = current_date.isoformat()
+                        if self._last_check_date is None:
+                            # Первая проверка после запуска: не повторяем слоты, обработанные до перезапуска
+                            self._processed_slots = await Repository.get_processed_slots(day)
+                            logger.info(f"📅 Восстановлено {len(self._processed_slots)} обработанных слотов за {current_date}")
+                        else:
+                            logger.info(f"📅 Новый день: {current_date}. Сброс состояния.")
+                            self._current_active_channel = None
+                            self._current_pinned_message = None
+                            self._processed_slots.clear()  # Очищаем обработанные слоты
+                        self._last_check_date = current_date
+                        self.context._spawn_write(Repository.prune_processed_slots(day))
+                    
+                    # Получаем активный канал для текущего времени
+                    active_channel_info = await self._get_active_channel_info(now)
                     
-                    logger.debug(f"📺 Активный канал по расписанию: {channel_id} (слот: {slot_id})")
+                    if active_channel_info:
+                        channel_id = active_channel_info["channel_id"]
+                        slot_id = active_channel_info["slot_id"]
+                        slot_label = active_channel_info["slot_label"]
                     
-                    # Проверяем, обрабатывали ли мы уже этот слот сегодня
-                    if slot_id not in self._processed_slots:
-                        logger.info(f"🆕 Новый временной слот {slot_id} для канала {channel_id}")
+                        logger.debug("📺 Активный канал по расписанию: {} (слот: {})", channel_id, slot_label)
+                    
+                        # Проверяем, обрабатывали ли мы уже этот слот сегодня
+                        if slot_id not in self._processed_slots:
+                            logger.info(f"🆕 Новый временной слот {slot_label} для канала {channel_id}")
                         
-                        # Получаем последнее сообщение из канала
-                        latest_message_id = await Repository.get_last_message(channel_id)
+                            # Получаем последнее сообщение из канала
+                            latest_message_id = await Repository.get_last_message(channel_id)
                         
-                        if latest_message_id:
-                            # Пытаемся переслать и закрепить сообщение ТОЛЬКО по расписанию
-                            success = await self.context.forward_and_pin_message(channel_id, latest_message_id)
+                            if latest_message_id:
+                                self._awaiting_channel = None
+                                # Пытаемся переслать и закрепить сообщение ТОЛЬКО по расписанию
+                                success = await self.context.forward_and_pin_message(channel_id, latest_message_id)
                             
-                            if success:
-                                self._current_active_channel = channel_id
-                                self._current_pinned_message = latest_message_id
-                                self._last_pin_time = datetime.now()
-                                self._processed_slots.add(slot_id)  # Отмечаем слот как обработанный
+                                if success:
+                                    self._current_active_channel = channel_id
+                                    self._current_pinned_message = latest_message_id
+                                    self._mark_slot_processed(slot_id)
                                 
-                                logger.info(f"✅ Успешно обработан слот {slot_id} для канала {channel_id} (по расписанию)")
+                                    logger.info(f"✅ Успешно обработан слот {slot_label} для канала {channel_id} (по расписанию)")
+                                else:
+                                    logger.error(f"❌ Не удалось обработать слот {slot_label} для канала {channel_id}")
                             else:
-                                logger.error(f"❌ Не удалось обработать слот {slot_id} для канала {channel_id}")
+                                logger.warning(f"⚠️ Нет сохраненных сообщений для канала {channel_id}, ждем первое сообщение")
+                                # Не опрашиваем БД: handle_message разбудит цикл, когда сообщение придет
+                                self._awaiting_channel = channel_id
                         else:
-                            logger.warning(f"⚠️ Нет сохраненных сообщений для канала {channel_id}")
-                            # Отмечаем слот как обработанный, чтобы не пытаться снова
-                            self._processed_slots.add(slot_id)
+                            logger.debug("✅ Слот {} уже обработан сегодня", slot_label)
                     else:
-                        logger.debug(f"✅ Слот {slot_id} уже обработан сегодня")
-                else:
-                    # Если нет активного канала, сбрасываем текущее состояние
-                    if self._current_active_channel:
-                        logger.info(f"⏰ Время активности канала {self._current_active_channel} закончилось")
-                        self._current_active_channel = None
-                        self._current_pinned_message = None
-                        self._last_pin_time = None
-                
-                # Проверяем каждые 60 секунд (достаточно для точности по минутам)
-                await asyncio.sleep(60)
-                
+                        # Если нет активного канала, сбрасываем текущее состояние
+                        if self._current_active_channel:
+                            logger.info(f"⏰ Время активности канала {self._current_active_channel} закончилось")
+                            self._current_active_channel = None
+                            self._current_pinned_message = None
+                    
+                    # Спим до ближайшей границы слота, а не опрашиваем расписание каждую минуту.
+                    # Слот, который не удалось обработать, повторяем через _check_interval.
+                    # Без расписания ждем только reschedule() после добавления слота
+                    delay = await self._seconds_until_next_boundary()
+                    if delay is None:
+                        logger.debug("💤 Расписание пусто, ожидание добавления слотов")
+                    elif (active_channel_info
+                            and active_channel_info["slot_id"] not in self._processed_slots
+                            and active_channel_info["channel_id"] != self._awaiting_channel):
+                        delay = min(delay, self._check_interval)
+                    try:
+                        await asyncio.wait_for(self._wakeup_event.wait(), timeout=delay)
+                        # Расписание изменилось или пришло ожидаемое сообщение - проверяем сразу
+                        self._wakeup_event.clear()
+                    except asyncio.TimeoutError:
+                        pass
+                    error_delay = self._error_delay_min
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Трассировка формируется loguru только при выводе записи
+                    logger.opt(exception=True).error(f"❌ Ошибка в задаче проверки расписания: {e}")
+                    # Повторяем в этой же задаче с растущей паузой, чтобы не спамить при постоянной ошибке
+                    logger.info(f"🔁 Повтор проверки расписания через {error_delay} с")
+                    await asyncio.sleep(error_delay)
+                    error_delay = min(error_delay * 2, self._error_delay_max)
         except asyncio.CancelledError:
             logger.info("⏹️ Задача проверки расписания отменена")
-        except Exception as e:
-            logger.error(f"❌ Ошибка в задаче проверки расписания: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            # Перезапускаем задачу через 10 секунд
-            await asyncio.sleep(10)
-            if not self._schedule_task.cancelled():
-                self._start_schedule_task()
-    
-    async def _get_active_channel_info(self) -> Optional[dict]:
+    
+    def _mark_slot_processed(self, slot_id: int) -> None:
+        """Отметить слот обработанным в памяти и (в фоне) в БД"""
+        self._processed_slots.add(slot_id)
+        self.context._spawn_write(Repository.add_processed_slot(self._last_check_date.isoformat(), slot_id))
+    
+    def _schedules_cache_fresh(self) -> bool:
+        """Кэш расписания загружен, не устарел по TTL и соответствует версии в Repository"""
+        return (self._schedules_cache is not None
+                and self._schedules_cache_version == Repository.get_schedules_version()
+                and time.monotonic() - self._schedules_cache_ts < self._schedules_cache_ttl)
+    
+    async def _cached_schedules(self) -> list:
+        """Расписание из памяти; перечитывается по TTL или после изменения слотов"""
+        if self._schedules_cache_fresh():
+            return self._schedules_cache
+        # Одновременные промахи (цикл расписания и обработчики) читают БД только один раз
+        async with self._schedules_lock:
+            if self._schedules_cache_fresh():
+                return self._schedules_cache
+            return await self._load_schedules()
+    
+    async def _load_schedules(self) -> list:
+        """Загрузка и разбор расписания из БД с построением отрезков для поиска слота"""
+        version = Repository.get_schedules_version()
+        parsed = []
+        for schedule in await Repository.get_schedules():
+            channel_id = schedule["channel_id"]
+            start_time = schedule["start_time"]
+            end_time = schedule["end_time"]
+            start_minutes = time_to_minutes(start_time)
+            end_minutes = time_to_minutes(end_time)
+            slot_id = _slot_key(channel_id, start_minutes, end_minutes)
+            parsed.append((channel_id, start_time, end_time, start_minutes, end_minutes,
+                           slot_id, end_minutes < start_minutes))
+        
+        # Описание слота и подпись для логов формируются один раз при загрузке расписания
+        slot_infos = [
+            {
+                "channel_id": channel_id,
+                "slot_id": slot_id,
+                "slot_label": f"{start_time}-{end_time}",
+                "start_time": start_time,
+                "end_time": end_time
+            }
+            for channel_id, start_time, end_time, _, _, slot_id, _ in parsed
+        ]
+        
+        segments = []
+        for index, (_, _, _, start_minutes, end_minutes, _, crosses_midnight) in enumerate(parsed):
+            if crosses_midnight:
+                segments.append((start_minutes, 24 * 60, index))
+                segments.append((0, end_minutes, index))
+            else:
+                segments.append((start_minutes, end_minutes, index))
+        segments.sort()
+        max_end = []
+        for _, end_minutes, _ in segments:
+            max_end.append(max(end_minutes, max_end[-1]) if max_end else end_minutes)
+        
+        self._slot_starts = [segment[0] for segment in segments]
+        self._slot_segments = segments
+        self._slot_max_end = max_end
+        self._slot_infos = slot_infos
+        self._active_slot_memo = None
+        self._schedules_cache = parsed
+        self._schedules_cache_ts = time.monotonic()
+        self._schedules_cache_version = version
+        return parsed
+    
+    async def _seconds_until_next_boundary(self) -> Optional[float]:
+        """Секунды до ближайшего начала/конца слота или полуночи (не больше _max_sleep); None - расписание пусто"""
+        schedules = await self._cached_schedules()
+        if not schedules:
+            return None
+        now = datetime.now()
+        now_seconds = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1_000_000
+        
+        # Полночь - тоже граница: в новый день обработанные слоты сбрасываются
+        boundaries = {0}
+        for _, _, _, start_minutes, end_minutes, _, _ in schedules:
+            boundaries.add(start_minutes * 60)
+            boundaries.add(end_minutes * 60)
+        
+        # Граница, которая уже прошла сегодня, наступит завтра
+        delta = min((boundary - now_seconds) % 86400 or 86400 for boundary in boundaries)
+        # Небольшой запас, чтобы проснуться уже внутри новой минуты
+        return max(1.0, min(delta + 0.5, self._max_sleep))
+    
+    def reschedule(self) -> None:
+        """Разбудить задачу проверки расписания без ее перезапуска"""
+        self._wakeup_event.set()
+    
+    async def _get_active_channel_info(self, now: Optional[datetime] = None) -> Optional[dict]:
         """Определение активного канала по расписанию с уникальным ID слота"""
         try:
-            schedules = await Repository.get_schedules()
-            current_time = datetime.now().strftime("%H:%M")
-            
-            for i, schedule in enumerate(schedules):
-                start_time = schedule["start_time"]
-                end_time = schedule["end_time"]
-                channel_id = schedule["channel_id"]
-                
-                if self._is_time_in_range(current_time, start_time, end_time):
-                    # Создаем уникальный ID слота на основе канала и времени
-                    slot_id = f"{channel_id}_{start_time}_{end_time}"
-                    
-                    logger.debug(f"📍 Найден активный канал {channel_id} для времени {current_time} (слот: {slot_id})")
-                    return {
-                        "channel_id": channel_id,
-                        "slot_id": slot_id,
-                        "start_time": start_time,
-                        "end_time": end_time
-                    }
-            
-            return None
+            # Обновляет отрезки и описания слотов, если расписание изменилось
+            await self._cached_schedules()
+            if now is None:
+                now = datetime.now()
+            current_minutes = now.hour * 60 + now.minute
+            # В пределах одной минуты (и одной версии расписания) ответ не меняется
+            memo = self._active_slot_memo
+            if memo is not None and memo[0] == current_minutes:
+                return memo[1]
+            info = self._find_active_slot(current_minutes)
+            self._active_slot_memo = (current_minutes, info)
+            if info is not None:
+                logger.debug("📍 Найден активный канал {} для времени {:%H:%M} (слот: {})",
+                             info["channel_id"], now, info["slot_label"])
+            return info
         except Exception as e:
             logger.error(f"❌ Ошибка при определении активного канала: {e}")
             return None
     
-    def _is_time_in_range(self, current_time: str, start_time: str, end_time: str) -> bool:
-        """Проверка, попадает ли текущее время в диапазон"""
+    def _find_active_slot(self, current_minutes: int) -> Optional[dict]:
+        """Бинарный поиск слота, покрывающего минуту суток"""
+        # Последний отрезок, начавшийся не позже текущей минуты
+        index = bisect_right(self._slot_starts, current_minutes) - 1
+        # Если ни один из отрезков [0..index] не дотягивается до текущей минуты - активных слотов нет
+        if index < 0 or self._slot_max_end[index] <= current_minutes:
+            return None
+
+        # При непересекающихся слотах подходит сразу первый кандидат
+        while index >= 0:
+            _, segment_end, schedule_index = self._slot_segments[index]
+            if current_minutes < segment_end:
+                break
+            index -= 1
+        else:
+            return None
+
+        return self._slot_infos[schedule_index]
+    
+    async def _unpin_one(self, chat_id: str, pinned_message_id: int) -> bool:
+        """Открепление сообщения в одном чате; True, если запись о нем можно удалить"""
         try:
-            def time_to_minutes(time_str):
-                h, m = map(int, time_str.split(':'))
-                return h * 60 + m
-            
-            current_minutes = time_to_minutes(current_time)
-            start_minutes = time_to_minutes(start_time)
-            end_minutes = time_to_minutes(end_time)
-            
-            # Обработка перехода через полночь
-            if end_minutes < start_minutes:
-                # Диапазон переходит через полночь (например, 22:00 - 02:00)
-                return current_minutes >= start_minutes or current_minutes < end_minutes
-            else:
-                # Обычный диапазон в рамках одного дня
-                return start_minutes <= current_minutes < end_minutes
-                
+            await self.context._api_call(
+                chat_id,
+                self.context.bot.unpin_chat_message,
+                message_id=pinned_message_id
+            )
+            logger.info(f"📌 Откреплено сообщение {pinned_message_id} в чате {chat_id}")
+            return True
         except Exception as e:
-            logger.error(f"❌ Ошибка при проверке времени: {e}")
+            # Отсутствие сообщения Telegram сообщает через BadRequest; остальные ошибки строку не разбирают
+            if isinstance(e, TelegramBadRequest) and _TG_MISSING_MSG_RE.search(e.message):
+                # Сообщение уже не существует, просто удаляем запись из БД
+                logger.info(f"📌 Запись о закрепленном сообщении {pinned_message_id} удалена (сообщение не найдено)")
+                return True
+            logger.error(f"❌ Не удалось открепить сообщение в чате {chat_id}: {e}")
             return False
     
     async def _unpin_current_messages(self):
         """Открепление текущих сообщений во всех чатах"""
         try:
-            target_chats = await Repository.get_target_chats()
-            for chat_id in target_chats:
-                pinned_message_id = await Repository.get_pinned_message(str(chat_id))
-                if pinned_message_id:
-                    try:
-                        await self.context.bot.unpin_chat_message(
-                            chat_id=chat_id,
-                            message_id=pinned_message_id
-                        )
-                        await Repository.delete_pinned_message(str(chat_id))
-                        logger.info(f"📌 Откреплено сообщение {pinned_message_id} в чате {chat_id}")
-                    except Exception as e:
-                        error_text = str(e).lower()
-                        if any(phrase in error_text for phrase in [
-                            "message to unpin not found",
-                            "message not found",
-                            "message_id_invalid"
-                        ]):
-                            # Сообщение уже не существует, просто удаляем запись из БД
-                            await Repository.delete_pinned_message(str(chat_id))
-                            logger.info(f"📌 Запись о закрепленном сообщении {pinned_message_id} удалена (сообщение не найдено)")
-                        else:
-                            logger.error(f"❌ Не удалось открепить сообщение в чате {chat_id}: {e}")
+            target_chats = await self.context.get_target_chats()
+            pinned = await self.context.get_pinned_map()
+            to_unpin = [(chat_id, pinned[chat_id]) for chat_id in target_chats if pinned.get(chat_id)]
+            
+            results = await asyncio.gather(
+                *(self._unpin_one(chat_id, message_id) for chat_id, message_id in to_unpin),
+                return_exceptions=True
+            )
+            
+            # Записи об откреплённых сообщениях удаляем одним запросом
+            unpinned = [chat_id for (chat_id, _), result in zip(to_unpin, results) if result is True]
+            await Repository.delete_pinned_messages(unpinned)
+            for chat_id in unpinned:
+                pinned.pop(chat_id, None)
         except Exception as e:
             logger.error(f"❌ Ошибка при откреплении сообщений: {e}")
     
@@ -231,45 +444,32 @@ class RunningState(BotState):
     
     async def stop(self) -> None:
         """Остановка состояния"""
-        if self._schedule_task and not self._schedule_task.done():
-            self._schedule_task.cancel()
-            try:
-                await self._schedule_task
-            except asyncio.CancelledError:
-                pass
+        await self._cancel_schedule_task()
         
-        # Открепляем все сообщения при остановке
+        # Открепляем все сообщения при остановке (по уже записанным в БД данным)
+        await self.context.flush_writes()
         await self._unpin_current_messages()
+        # Закрепы сняты - после повторного запуска текущий слот нужно закрепить заново
+        await Repository.clear_processed_slots()
         
         # Уведомляем администраторов
-        for admin_id in self.context.config.admin_ids:
-            try:
-                await self.context.bot.send_message(admin_id, "⏹️ Бот остановлен. Работа по расписанию деактивирована.")
-            except Exception as e:
-                logger.error(f"Не удалось уведомить администратора {admin_id}: {e}")
+        await self.context._notify_admins("⏹️ Бот остановлен. Работа по расписанию деактивирована.")
         
-        self.context.state = IdleState(self.context)
+        self.context._set_state(self.context._idle_state)
     
     async def handle_message(self, channel_id: str, message_id: int) -> None:
         """Обработка нового сообщения из канала - ТОЛЬКО сохранение, БЕЗ автопересылки"""
-        await Repository.save_last_message(channel_id, message_id)
-        logger.info(f"💾 Сохранено новое сообщение {message_id} из канала {channel_id} (автопересылка ОТКЛЮЧЕНА)")
+        await _save_channel_post(channel_id, message_id, "автопересылка ОТКЛЮЧЕНА")
+        
+        # Активный слот этого канала ждал первое сообщение - обрабатываем его сразу, а не на следующей границе
+        if channel_id == self._awaiting_channel:
+            self._wakeup_event.set()
         
         # ВАЖНО: НЕ пересылаем сообщения автоматически при их появлении
         # Пересылка происходит ТОЛЬКО по расписанию через _schedule_check()
         
         logger.info(f"ℹ️ Сообщение {message_id} из канала {channel_id} будет переслано только по расписанию")
     
-    async def find_latest_message(self, channel_id: str) -> Optional[int]:
-        """Поиск последнего доступного сообщения в канале"""
-        last_id = await Repository.get_last_message(channel_id)
-        return await find_msg(self.context.bot, channel_id, self.context.config.owner_id, last_id)
-
-    async def _rotate_to_next_channel(self) -> bool:
-        """Заглушка для совместимости, теперь не используется"""
-        logger.warning("Метод _rotate_to_next_channel не используется в режиме расписания")
-        return False
-
     async def _get_active_channel(self) -> Optional[str]:
         """Получение текущего активного канала"""
         info = await self._get_active_channel_info()
@@ -281,134 +481,289 @@ class BotContext:
     def __init__(self, bot, config):
         self.bot = bot
         self.config = config
-        self.state: BotState = IdleState(self)
-        # Для хранения закрепленных сообщений
-        self.pinned_messages = {}
+        # Объекты состояний создаются один раз и переключаются в start()/stop()
+        self._idle_state = IdleState(self)
+        self._running_state = RunningState(self)
+        self.state: BotState = self._idle_state
+        self._state_handle_message = self._idle_state.handle_message
+        # Переходы start/stop не пересекаются: повторная команда ждет завершения предыдущей
+        self._transition_lock = asyncio.Lock()
+        # Закрепленные сообщения по чатам; бот сам их пишет, поэтому БД читается один раз
+        self.pinned_messages: Dict[str, int] = {}
+        self._pinned_loaded = False
+        # Снимки администраторов и каналов-источников; обновляются через invalidate_config_cache()
+        self._admin_ids = tuple(config.admin_ids)
+        self._source_channels = tuple(config.source_channels)
+        self._source_keys = frozenset(channel.lower() for channel in self._source_channels)
+        # Фоновые записи в БД, запущенные во время рассылки
+        self._pending_writes: Set[asyncio.Task] = set()
+        # Источник закрепа по чатам: chat_id -> (channel_id, message_id, forwarded_message_id);
+        # загружается из БД при запуске, поэтому переживает перезапуск бота
+        self._last_forwarded: Dict[str, tuple] = {}
+        # Чаты без прав на закрепление: chat_id -> момент (time.monotonic()), до которого чат пропускается
+        self._pin_denied: Dict[str, float] = {}
+        # Кэш целевых чатов; сбрасывается через invalidate_target_chats() или по истечении TTL
+        # (на случай изменений в БД в обход обработчиков бота)
+        self._target_chats_cache: Optional[FrozenSet[str]] = None
+        self._target_chats_cache_ts: float = 0
+        self._target_chats_cache_ttl = 300
+        # Результаты поиска последнего сообщения: channel_id -> (момент истечения, message_id);
+        # повторные попытки после ошибки не перебирают сообщения в Telegram заново
+        self._latest_found: Dict[str, tuple] = {}
+        self._latest_found_ttl = 15
+        # Ограничение параллельных запросов к Telegram при рассылке по чатам
+        self._forward_semaphore = asyncio.Semaphore(20)
+        # Ограничение числа каналов-источников, рассылаемых одновременно
+        self._source_semaphore = asyncio.Semaphore(8)
+        # Упреждающие лимиты Telegram: ~30 запросов/с на бота и ~1/с на чат (с небольшим запасом на серию)
+        self._global_bucket = AsyncTokenBucket(rate=30, capacity=30)
+        self._chat_buckets = defaultdict(lambda: AsyncTokenBucket(rate=1, capacity=3))
     
     async def start(self) -> None:
-        await self.state.start()
+        async with self._transition_lock:
+            await self.state.start()
     
     async def stop(self) -> None:
-        await self.state.stop()
+        async with self._transition_lock:
+            await self.state.stop()
+    
+    async def toggle(self) -> bool:
+        """Запуск или остановка в зависимости от текущего состояния; возвращает, запущен ли бот"""
+        # Проверка состояния и переход - под одной блокировкой, иначе двойное нажатие остановит бот дважды
+        async with self._transition_lock:
+            if self.is_running:
+                await self.state.stop()
+            else:
+                await self.state.start()
+        return self.is_running
+    
+    @property
+    def is_running(self) -> bool:
+        """Бот работает по расписанию"""
+        return self.state is self._running_state
     
     async def handle_message(self, channel_id: str, message_id: int) -> None:
         """Делегирование обработки сообщения текущему состоянию"""
-        await self.state.handle_message(channel_id, message_id)
+        # Пришло новое сообщение - найденный ранее последний ID устарел
+        self._latest_found.pop(channel_id, None)
+        await self._state_handle_message(channel_id, message_id)
     
-    async def rotate_now(self) -> bool:
-        """Немедленно активировать текущий канал по расписанию"""
-        if not isinstance(self.state, RunningState):
-            logger.warning("Нельзя выполнить немедленную ротацию: бот не запущен")
-            return False
-        active_channel = await self.state._get_active_channel()
-        if active_channel:
-            message_id = await Repository.get_last_message(active_channel)
-            if message_id:
-                return await self.forward_and_pin_message(active_channel, message_id)
-        return False
-    
-    async def forward_and_pin_message(self, channel_id: str, message_id: int) -> bool:
+    def _set_state(self, state: BotState) -> None:
+        """Смена состояния с привязкой обработчика сообщений, вызываемого на каждый пост"""
+        self.state = state
+        self._state_handle_message = state.handle_message
+    
+    async def find_latest_message(self, channel_id: str, last_id: Optional[int]) -> Optional[int]:
+        """Поиск последнего сообщения в канале с коротким кэшированием результата"""
+        cached = self._latest_found.get(channel_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        # Найденный ID сразу сохраняется: следующий поиск начнется от него
+        latest_id = await find_msg(self.bot, channel_id, self.config.owner_id, last_id,
+                                   on_found=partial(Repository.save_last_message, channel_id))
+        self._latest_found[channel_id] = (time.monotonic() + self._latest_found_ttl, latest_id)
+        return latest_id
+    
+    def _spawn_write(self, coro) -> None:
+        """Фоновая запись в БД, не задерживающая рассылку"""
+        task = asyncio.create_task(coro)
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+    
+    async def flush_writes(self) -> None:
+        """Дождаться завершения фоновых записей в БД"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+    
+    def invalidate_config_cache(self) -> None:
+        """Обновить снимки администраторов и каналов-источников после изменения конфигурации"""
+        self._admin_ids = tuple(self.config.admin_ids)
+        self._source_channels = tuple(self.config.source_channels)
+        self._source_keys = frozenset(channel.lower() for channel in self._source_channels)
+    
+    def is_source_channel(self, chat_id: str, username: Optional[str] = None) -> bool:
+        """Проверка канала-источника по ID или username без перебора списка"""
+        return chat_id in self._source_keys or bool(username and username.lower() in self._source_keys)
+    
+    async def get_target_chats(self) -> FrozenSet[str]:
+        """Целевые чаты из кэша; БД читается только после сброса или по TTL"""
+        if (self._target_chats_cache is None
+                or time.monotonic() - self._target_chats_cache_ts >= self._target_chats_cache_ttl):
+            self._target_chats_cache = frozenset(await Repository.get_target_chats())
+            self._target_chats_cache_ts = time.monotonic()
+        return self._target_chats_cache
+    
+    async def get_pinned_map(self) -> Dict[str, int]:
+        """Закрепленные сообщения из памяти; из БД загружаются только при первом обращении"""
+        if not self._pinned_loaded:
+            self.pinned_messages.update(await Repository.get_all_pinned_messages())
+            self._pinned_loaded = True
+        return self.pinned_messages
+    
+    async def load_pin_sources(self) -> int:
+        """Загрузка источников закрепов из БД, чтобы после перезапуска не пересылать то же сообщение повторно"""
+        self._last_forwarded.update(await Repository.get_all_pin_sources())
+        return len(self._last_forwarded)
+    
+    def clear_pin_denied(self, chat_id: str) -> None:
+        """Снова пробовать закреплять в чате (например, после выдачи боту прав)"""
+        self._pin_denied.pop(chat_id, None)
+    
+    def invalidate_target_chats(self) -> None:
+        """Сбросить кэш целевых чатов после их добавления или удаления"""
+        self._target_chats_cache = None
+    
+    def reschedule(self) -> None:
+        """Применить изменения расписания немедленно, если бот запущен"""
+        if self.state is self._running_state:
+            self._running_state.reschedule()
+    
+    async def _api_call(self, chat_id: str, call, **kwargs):
+        """Вызов метода Telegram API для чата с учетом лимитов"""
+        await self._global_bucket.acquire()
+        await self._chat_buckets[chat_id].acquire()
+        return await _retry_after(call, chat_id=chat_id, **kwargs)
+    
+    async def _forward_to_one(self, chat_id: str, channel_id: str, message_id: int,
+                              prev_pinned: Optional[int]) -> ForwardResult:
+        """Пересылка и закрепление в одном чате; ошибки возвращаются в результате, а не логируются здесь"""
+        result = ForwardResult(chat_id)
+        async with self._forward_semaphore:
+            try:
+                # Без прав на закрепление пересылка только засоряет чат - пропускаем до истечения TTL
+                if self._pin_denied.get(chat_id, 0) > time.monotonic():
+                    logger.debug("🚫 Нет прав на закрепление в чате {}, чат пропущен", chat_id)
+                    result.skipped = True
+                    return result
+                
+                # То же сообщение уже закреплено в этом чате - повторять нечего
+                if prev_pinned and self._last_forwarded.get(chat_id) == (channel_id, message_id, prev_pinned):
+                    logger.debug("⏭️ Сообщение {} из канала {} уже закреплено в чате {}", message_id, channel_id, chat_id)
+                    result.forwarded = True
+                    return result
+
+                # Пересылаем новое сообщение
+                try:
+                    fwd = await self._api_call(
+                        chat_id,
+                        self.bot.forward_message,
+                        from_chat_id=channel_id,
+                        message_id=message_id
+                    )
+                    logger.debug(f"📤 Сообщение переслано в чат {chat_id}")
+                except Exception as e:
+                    # Если сообщение не может быть переслано (например, не существует)
+                    result.source_missing = (isinstance(e, TelegramBadRequest)
+                                             and bool(_TG_MISSING_MSG_RE.search(e.message)))
+                    result.error = f"пересылка: {e}"
+                    return result
+                result.forwarded = True
+
+                # Даем циклу событий обработать входящие апдейты между пересылкой и закреплением
+                await asyncio.sleep(0)
+                
+                # Открепление предыдущего и закрепление нового не зависят друг от друга
+                unpin_result, pin_result = await asyncio.gather(
+                    self._api_call(
+                        chat_id,
+                        self.bot.unpin_chat_message,
+                        message_id=prev_pinned
+                    ) if prev_pinned and prev_pinned != fwd.message_id else asyncio.sleep(0),
+                    self._api_call(
+                        chat_id,
+                        self.bot.pin_chat_message,
+                        message_id=fwd.message_id,
+                        disable_notification=True
+                    ),
+                    return_exceptions=True
+                )
+
+                if prev_pinned and prev_pinned != fwd.message_id:
+                    if isinstance(unpin_result, Exception):
+                        logger.warning(f"⚠️ Не удалось открепить предыдущее сообщение в чате {chat_id}: {unpin_result}")
+                    else:
+                        logger.debug(f"📌 Откреплено предыдущее сообщение {prev_pinned} в чате {chat_id}")
+
+                # Даже если не удалось закрепить, пересылка прошла успешно
+                if isinstance(pin_result, Exception):
+                    result.error = f"закрепление: {pin_result}"
+                    if isinstance(pin_result, TelegramAPIError) and _TG_PIN_DENIED_RE.search(pin_result.message):
+                        self._pin_denied[chat_id] = time.monotonic() + _PIN_DENIED_TTL
+                else:
+                    result.pinned_id = fwd.message_id
+                    logger.info(f"📌 Сообщение {message_id} из канала {channel_id} переслано и закреплено в чат {chat_id}")
+            except Exception as e:
+                result.error = str(e)
+        return result
+    
+    async def forward_and_pin_message(self, channel_id: str, message_id: int,
+                                      pinned_map: Optional[Dict[str, int]] = None) -> bool:
         """Пересылка и закрепление сообщений из канала во все целевые чаты без пересылки админу для проверки"""
         try:
-            target_chats = await Repository.get_target_chats()
+            target_chats = await self.get_target_chats()
             if not target_chats:
                 logger.warning("⚠️ Нет целевых чатов для пересылки")
                 return False
             
-            # Для отслеживания общего результата операции
-            success = False
+            # Закрепленные сообщения всех чатов берем из памяти
+            if pinned_map is None:
+                pinned_map = await self.get_pinned_map()
             
-            # Пересылаем сообщение во все целевые чаты
-            for chat_id in target_chats:
+            # Вторая попытка - с более новым сообщением, если исходное пропало из канала
+            for attempt in range(_FORWARD_ATTEMPTS):
+                # Пересылаем сообщение во все целевые чаты параллельно
+                results = await asyncio.gather(
+                    *(self._forward_to_one(chat_id, channel_id, message_id, pinned_map.get(chat_id))
+                      for chat_id in target_chats)
+                )
+                # Состояние и БД обновляются одним пакетом после рассылки по всем чатам
+                pinned = [(result.chat_id, result.pinned_id) for result in results if result.pinned_id]
+                if pinned:
+                    self.pinned_messages.update(pinned)
+                    self._last_forwarded.update(
+                        (chat_id, (channel_id, message_id, forwarded_id)) for chat_id, forwarded_id in pinned
+                    )
+                    # Запись в БД - одной транзакцией в фоне, чтобы не задерживать рассылку
+                    self._spawn_write(Repository.record_forwards(channel_id, message_id, pinned))
+                
+                if not any(result.source_missing for result in results):
+                    # Ошибки по чатам - одной строкой на всю рассылку
+                    failed = [f"{result.chat_id} ({result.error})" for result in results if result.error]
+                    if failed:
+                        logger.error(f"❌ Ошибки при рассылке сообщения {message_id} из канала {channel_id}: {'; '.join(failed)}")
+                    # Возвращаем общий результат операции; пропущенные без прав чаты неудачей не считаются,
+                    # иначе слот повторялся бы на каждом цикле до истечения _PIN_DENIED_TTL
+                    if all(result.skipped for result in results):
+                        logger.warning(f"⚠️ Нет прав на закрепление ни в одном целевом чате, сообщение {message_id} не переслано")
+                        return True
+                    return any(result.forwarded for result in results)
+                
+                logger.warning(f"⚠️ Сообщение {message_id} не найдено в канале {channel_id}")
+                if attempt == _FORWARD_ATTEMPTS - 1:
+                    return False
+                
+                # Пытаемся найти более новое сообщение
+                logger.info(f"🔍 Попытка найти более новое сообщение в канале {channel_id}")
                 try:
-                    # Получаем предыдущее закрепленное сообщение для этого чата
-                    prev_pinned = await Repository.get_pinned_message(str(chat_id))
-                    
-                    # Пересылаем новое сообщение
-                    try:
-                        fwd = await self.bot.forward_message(
-                            chat_id=chat_id,
-                            from_chat_id=channel_id,
-                            message_id=message_id
-                        )
-                        logger.debug(f"📤 Сообщение переслано в чат {chat_id}")
-                        
-                        # Если успешно переслали, пробуем открепить предыдущее 
-                        if prev_pinned:
-                            try:
-                                await self.bot.unpin_chat_message(
-                                    chat_id=chat_id,
-                                    message_id=prev_pinned
-                                )
-                                logger.debug(f"📌 Откреплено предыдущее сообщение {prev_pinned} в чате {chat_id}")
-                            except Exception as e:
-                                logger.warning(f"⚠️ Не удалось открепить предыдущее сообщение в чате {chat_id}: {e}")
-                        
-                        # Закрепляем новое сообщение
-                        try:
-                            await self.bot.pin_chat_message(
-                                chat_id=chat_id,
-                                message_id=fwd.message_id,
-                                disable_notification=True
-                            )
-                            
-                            # Сохраняем ID нового закрепленного сообщения
-                            await Repository.save_pinned_message(str(chat_id), fwd.message_id)
-                            
-                            # Если у нас есть словарь для отслеживания, обновляем его
-                            self.pinned_messages[str(chat_id)] = fwd.message_id
-                            
-                            logger.info(f"📌 Сообщение {message_id} из канала {channel_id} переслано и закреплено в чат {chat_id}")
-                            success = True
-                        except Exception as e:
-                            logger.error(f"❌ Не удалось закрепить сообщение в чате {chat_id}: {e}")
-                            # Даже если не удалось закрепить, пересылка прошла успешно
-                            success = True
-                    except Exception as e:
-                        # Если сообщение не может быть переслано (например, не существует)
-                        error_text = str(e).lower()
-                        if any(phrase in error_text for phrase in [
-                            "message not found", 
-                            "message to forward not found",
-                            "message_id_invalid"
-                        ]):
-                            logger.warning(f"⚠️ Сообщение {message_id} не найдено в канале {channel_id}")
-                            
-                            # Пытаемся найти более новое сообщение
-                            logger.info(f"🔍 Попытка найти более новое сообщение в канале {channel_id}")
-                            try:
-                                from utils.message_utils import find_latest_message
-                                latest_message_id = await find_latest_message(self.bot, channel_id, self.config.owner_id, message_id)
-                                
-                                if latest_message_id and latest_message_id != message_id:
-                                    logger.info(f"📨 Найдено более новое сообщение {latest_message_id} в канале {channel_id}")
-                                    await Repository.save_last_message(channel_id, latest_message_id)
-                                    
-                                    # Рекурсивно пробуем переслать новое сообщение
-                                    return await self.forward_and_pin_message(channel_id, latest_message_id)
-                                else:
-                                    logger.warning(f"⚠️ Не удалось найти новые сообщения в канале {channel_id}")
-                                    return False
-                            except Exception as find_error:
-                                logger.error(f"❌ Ошибка при поиске новых сообщений в канале {channel_id}: {find_error}")
-                                return False
-                        else:
-                            logger.error(f"❌ Не удалось переслать сообщение из канала {channel_id} в чат {chat_id}: {e}")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка при обработке чата {chat_id}: {e}")
-            
-            # Возвращаем общий результат операции
-            return success
+                    latest_message_id = await self.find_latest_message(channel_id, message_id)
+                except Exception as find_error:
+                    logger.error(f"❌ Ошибка при поиске новых сообщений в канале {channel_id}: {find_error}")
+                    return False
+                
+                if not latest_message_id or latest_message_id == message_id:
+                    logger.warning(f"⚠️ Не удалось найти новые сообщения в канале {channel_id}")
+                    return False
+                
+                logger.info(f"📨 Найдено более новое сообщение {latest_message_id} в канале {channel_id}")
+                message_id = latest_message_id
+            return False
         except Exception as e:
-            logger.error(f"❌ Критическая ошибка в forward_and_pin_message: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.opt(exception=True).error(f"❌ Критическая ошибка в forward_and_pin_message: {e}")
             return False
     
     async def forward_latest_messages(self) -> bool:
         """Пересылает последние сообщения из всех каналов"""
-        success = False
-        source_channels = self.config.source_channels
+        source_channels = self._source_channels
         
         if not source_channels:
             logger.warning("Нет настроенных исходных каналов")
@@ -417,38 +772,54 @@ class BotContext:
         logger.info(f"Найдено {len(source_channels)} исходных каналов")
         
         # Проверяем наличие целевых чатов
-        target_chats = await Repository.get_target_chats()
+        target_chats = await self.get_target_chats()
         if not target_chats:
             logger.warning("Нет целевых чатов для пересылки. Бот должен быть добавлен в группы/супергруппы.")
             return False
         
         logger.info(f"Найдено {len(target_chats)} целевых чатов")
         
-        for channel_id in source_channels:
+        # Последние и закрепленные сообщения загружаем один раз на всю рассылку
+        last_messages = await Repository.get_last_messages(source_channels)
+        pinned_map = await self.get_pinned_map()
+        
+        async def _forward_channel(channel_id: str) -> bool:
             # Получаем ID последнего сообщения
-            message_id = await Repository.get_last_message(channel_id)
+            message_id = last_messages.get(channel_id)
             
             if not message_id:
                 logger.warning(f"Не найдено последнее сообщение для канала {channel_id}")
-                continue
+                return False
             
             logger.info(f"Найдено сообщение {message_id} для канала {channel_id}")
             
             # Пересылаем и закрепляем сообщение
-            result = await self.forward_and_pin_message(channel_id, message_id)
-            success = success or result
+            async with self._source_semaphore:
+                result = await self.forward_and_pin_message(channel_id, message_id, pinned_map)
             
             if result:
                 logger.info(f"Успешно переслано сообщение {message_id} из канала {channel_id}")
             else:
                 logger.warning(f"Не удалось переслать сообщение {message_id} из канала {channel_id}")
+            return result
         
-        return success
+        results = await asyncio.gather(
+            *(_forward_channel(channel_id) for channel_id in source_channels),
+            return_exceptions=True
+        )
+        for channel_id, result in zip(source_channels, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Ошибка при пересылке из канала {channel_id}: {result}")
+        return any(result is True for result in results)
     
     async def _notify_admins(self, message: str):
         """Отправка уведомления всем администраторам бота"""
-        for admin_id in self.config.admin_ids:
-            try:
-                await self.bot.send_message(admin_id, message)
-            except Exception as e:
-                logger.error(f"Не удалось уведомить администратора {admin_id}: {e}")
\ No newline at end of file
+        admin_ids = self._admin_ids
+        results = await asyncio.gather(
+            # Через общие лимиты: при многих администраторах не упираемся в ограничения Telegram
+            *(self._api_call(str(admin_id), self.bot.send_message, text=message) for admin_id in admin_ids),
+            return_exceptions=True
+        )
+        for admin_id, result in zip(admin_ids, results):
+            if isinstance(result, Exception):
+                logger.error(f"Не удалось уведомить администратора {admin_id}: {result}")
\ No newline at end of file
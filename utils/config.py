@@ -41,6 +41,8 @@ class Config:
         
         # Для обратной совместимости - сохраняем первого администратора как owner_id
         self.owner_id: int = self.admin_ids[0] if self.admin_ids else 0
+        # Множество для быстрой проверки прав в is_admin
+        self._admin_set = frozenset(self.admin_ids)
         
         self.source_channels: List[str] = []
         
@@ -69,7 +71,7 @@ class Config:
     
     def is_admin(self, user_id: int) -> bool:
         """Проверка, является ли пользователь администратором"""
-        return user_id in self.admin_ids
+        return user_id in self._admin_set
     
     def _load_channels_from_config(self):
         """Загрузка каналов из конфигурационного файла"""
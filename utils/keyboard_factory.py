@@ -3,27 +3,37 @@
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from typing import Dict, List, Any
 
+def _build_main_keyboard(running: bool) -> Any:
+    """Build main menu keyboard for the given rotation state"""
+    kb = InlineKeyboardBuilder()
+    kb.button(
+        text="🔄 Запустить ротацию" if not running else "⏹ Остановить ротацию",
+        callback_data="toggle_forward"
+    )
+    kb.button(text="⚙️ Управление каналами", callback_data="channels")
+    kb.button(text="🤖 Клонировать бота", callback_data="clone_bot")
+    kb.button(text="👥 Управление клонами", callback_data="manage_clones")
+    kb.button(text="💬 Список целевых чатов", callback_data="list_chats")
+    kb.button(text="📅 Управление расписанием", callback_data="manage_schedule")  # Новая кнопка
+    kb.adjust(2)
+    return kb.as_markup()
+
+
+# Main menu depends only on the rotation state, so both variants are built once
+_MAIN_KEYBOARD_RUNNING = _build_main_keyboard(True)
+_MAIN_KEYBOARD_IDLE = _build_main_keyboard(False)
+
+
 class KeyboardFactory:
     """Factory Pattern implementation for creating keyboards"""
     
     @staticmethod
     def create_main_keyboard(running: bool = False) -> Any:
         """Create main menu keyboard"""
-        kb = InlineKeyboardBuilder()
-        kb.button(
-            text="🔄 Запустить ротацию" if not running else "⏹ Остановить ротацию",
-            callback_data="toggle_forward"
-        )
-        kb.button(text="⚙️ Управление каналами", callback_data="channels")
-        kb.button(text="🤖 Клонировать бота", callback_data="clone_bot")
-        kb.button(text="👥 Управление клонами", callback_data="manage_clones")
-        kb.button(text="💬 Список целевых чатов", callback_data="list_chats")
-        kb.button(text="📅 Управление расписанием", callback_data="manage_schedule")  # Новая кнопка
-        kb.adjust(2)
-        return kb.as_markup()
+        return _MAIN_KEYBOARD_RUNNING if running else _MAIN_KEYBOARD_IDLE
 
     @staticmethod
-    def create_chat_list_keyboard(chats: Dict[int, str]) -> Any:
+    def create_chat_list_keyboard(chats: Dict[str, str]) -> Any:
         """Create chat list keyboard with remove buttons and pin test buttons"""
         kb = InlineKeyboardBuilder()
         for chat_id, title in chats.items():
@@ -1,19 +1,67 @@
 # ПОЛНОСТЬЮ ЗАМЕНИТЬ utils/message_utils.py на:
 
-from typing import Optional
+import asyncio
+import re
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
 from loguru import logger
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
+from utils.rate_limiter import AsyncTokenBucket
 
-async def find_latest_message(bot: Bot, channel_id: str, owner_id: int, last_saved_id: Optional[int] = None) -> Optional[int]:
+# Ответы Telegram, означающие отсутствие сообщения с таким ID
+_NOT_FOUND_RE = re.compile(r"message (?:to (?:copy|forward) )?not found|message_id_invalid", re.IGNORECASE)
+# Ответы о недоступном чате: дальнейшие проверки в нем бессмысленны
+_CHAT_NOT_FOUND_RE = re.compile(r"chat not found|peer_id_invalid|channel_private", re.IGNORECASE)
+_MAX_ERROR_STREAK = 5  # Неожиданных ошибок подряд, после которых поиск прерывается
+# Сколько ID проверяется одновременно на линейных участках поиска; должно быть заметно меньше
+# лимита соединений сессии бота (100 у AiohttpSession aiogram), иначе проверки встанут в очередь пула
+_PROBE_BATCH = 10
+# Общие для всех поисков ограничения: одновременные проверки и упреждающий лимит частоты
+_probe_semaphore = asyncio.Semaphore(_PROBE_BATCH)
+_probe_bucket = AsyncTokenBucket(rate=20, capacity=_PROBE_BATCH)
+
+
+class _SearchAborted(Exception):
+    """Поиск прерван из-за серии неожиданных ошибок"""
+
+
+async def _probe_batch(probe: Callable[[int], Awaitable[bool]], message_ids: range) -> List[bool]:
+    """Одновременная проверка нескольких ID; флаги возвращаются в порядке message_ids"""
+    # Дожидаемся всех проверок даже при ошибке одной из них: иначе оставшиеся копии
+    # уйдут в чат проверки уже без удаления
+    results = await asyncio.gather(*(probe(msg_id) for msg_id in message_ids), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+async def _first_existing(probe: Callable[[int], Awaitable[bool]], message_ids: range) -> Tuple[Optional[int], int]:
+    """Первый существующий ID в порядке message_ids и число выполненных проверок"""
+    probed = 0
+    for batch_start in range(0, len(message_ids), _PROBE_BATCH):
+        batch = message_ids[batch_start:batch_start + _PROBE_BATCH]
+        probed += len(batch)
+        for msg_id, exists in zip(batch, await _probe_batch(probe, batch)):
+            if exists:
+                return msg_id, probed
+    return None, probed
+
+async def find_latest_message(bot: Bot, channel_id: str, owner_id: int, last_saved_id: Optional[int] = None,
+                              on_found: Optional[Callable[[int], Awaitable[None]]] = None,
+                              scan_gaps: bool = False) -> Optional[int]:
     """
     Универсальная функция для поиска последнего доступного сообщения в канале
-    БЕЗ пересылки сообщений админу для проверки
+    
+    Проверяемые сообщения копируются в чат владельца и сразу удаляются;
+    если чат владельца недоступен, поиск прерывается, а не копирует в сам канал
     
     Args:
         bot: Экземпляр бота
         channel_id: ID канала для поиска
-        owner_id: ID владельца бота (НЕ используется для пересылки)
+        owner_id: ID владельца бота: в его чат копируются проверяемые сообщения
         last_saved_id: Последний сохраненный ID сообщения (опционально)
+        on_found: Сохранение найденного ID, чтобы следующий поиск начинался от него (опционально)
+        scan_gaps: Искать сообщения за удаленными после найденного; без сохраненного ID - всегда
     
     Returns:
         ID последнего доступного сообщения или None
@@ -23,118 +71,169 @@ async def find_latest_message(bot: Bot, channel_id: str, owner_id: int, last_sav
         
         # Определяем начальную точку поиска
         if last_saved_id:
-            # Начинаем поиск с последнего сохраненного ID + небольшой запас
-            start_id = last_saved_id + 50
+            # Последний сохраненный ID - опорная точка для поиска более новых сообщений
+            start_id = last_saved_id
             logger.info(f"📍 Начинаю поиск с ID {start_id} (последний сохраненный: {last_saved_id})")
         else:
             # Если нет сохраненного ID, начинаем с разумного значения
             start_id = 1000
             logger.info(f"📍 Начинаю поиск с ID {start_id} (нет сохраненного ID)")
         
-        max_check = 200  # Максимальное количество сообщений для проверки
+        # Копии при проверке уходят владельцу, а не в сам канал: подписчики их не видят,
+        # а бот не получает собственные копии как новые посты канала
+        probe_chat_id = owner_id or channel_id
+        error_streak = 0
+        
+        async def probe(message_id: int) -> bool:
+            """Проверка ID; серия неожиданных ошибок подряд прерывает поиск"""
+            nonlocal error_streak
+            exists = await _probe(bot, channel_id, message_id, probe_chat_id)
+            if exists is None:
+                error_streak += 1
+                if error_streak > _MAX_ERROR_STREAK:
+                    raise _SearchAborted(f"{error_streak} неожиданных ошибок подряд")
+                return False
+            error_streak = 0
+            return exists
+        
+        max_gap = 20  # Сколько подряд отсутствующих ID считается концом канала
         checked_count = 0
         valid_id = None
         
-        # Сначала ищем вперед (более новые сообщения)
-        logger.debug("🔎 Поиск более новых сообщений...")
-        for msg_id in range(start_id, start_id + max_check):
-            checked_count += 1
-            
-            if checked_count % 20 == 0:
-                logger.info(f"⏳ Проверено {checked_count} сообщений (текущий ID: {msg_id})")
-            
-            try:
-                # Используем copy_message вместо forward_message для проверки существования
-                # copy_message не создает видимого сообщения для пользователя
-                test_msg = await bot.copy_message(
-                    chat_id=channel_id,  # Копируем в тот же канал
-                    from_chat_id=channel_id,
-                    message_id=msg_id,
-                    disable_notification=True
-                )
-                
-                # Если копирование успешно, сообщение существует
-                # Сразу удаляем скопированное сообщение
-                try:
-                    await bot.delete_message(chat_id=channel_id, message_id=test_msg.message_id)
-                except:
-                    pass  # Игнорируем ошибки удаления
-                
-                logger.info(f"✅ Найдено новое сообщение {msg_id} в канале {channel_id}")
-                valid_id = msg_id
-                # Продолжаем поиск, чтобы найти самое последнее
-                
-            except Exception as e:
-                error_text = str(e).lower()
-                if any(phrase in error_text for phrase in [
-                    "message not found", 
-                    "message to copy not found",
-                    "message_id_invalid",
-                    "message to forward not found"
-                ]):
-                    # Сообщение не найдено, это нормально
-                    continue
-                else:
-                    # Другая ошибка, логируем предупреждение
-                    logger.debug(f"⚠️ Неожиданная ошибка при проверке сообщения {msg_id}: {e}")
-                    continue
+        # Опорное сообщение: обычно это само сохраненное сообщение - проверяем его одним запросом
+        if last_saved_id:
+            if await probe(start_id):
+                low, probed = start_id, 1
+            else:
+                # Сохраненное могли удалить - первое существующее после start_id
+                low, probed = await _first_existing(probe, range(start_id + 1, start_id + max_gap))
+                probed += 1
+        else:
+            low, probed = await _first_existing(probe, range(start_id, start_id + max_gap))
+        checked_count += probed
         
-        # Если не нашли более новые сообщения, ищем назад от исходной точки
-        if not valid_id:
+        if low is None:
+            # От start_id сообщений нет: шаги вниз start_id-1, -2, -4, ... до первого найденного,
+            # от него последнее сообщение находится тем же поиском вверх
             logger.debug("🔙 Поиск более старых сообщений...")
-            search_start = start_id if last_saved_id else start_id
+            step = 1
+            msg_id = start_id
+            while msg_id > 1:
+                msg_id = max(start_id - step, 1)
+                checked_count += 1
+                if await probe(msg_id):
+                    low = msg_id
+                    break
+                step *= 2
+        
+        while low is not None:
+            # Экспоненциальный поиск вверх: low+1, +2, +4, ... до первого промаха
+            logger.debug("🔎 Поиск более новых сообщений...")
+            step = 1
+            while True:
+                checked_count += 1
+                if not await probe(low + step):
+                    high = low + step  # Первый ненайденный ID
+                    break
+                low += step
+                step *= 2
             
-            for msg_id in range(search_start, max(1, search_start - max_check), -1):
+            # Бинарный поиск последнего сообщения в (low, high)
+            while high - low > 1:
+                middle = (low + high) // 2
                 checked_count += 1
-                
-                if checked_count % 20 == 0:
-                    logger.info(f"⏳ Проверено {checked_count} сообщений (текущий ID: {msg_id})")
-                
-                try:
-                    # Используем copy_message для проверки
-                    test_msg = await bot.copy_message(
-                        chat_id=channel_id,
-                        from_chat_id=channel_id,
-                        message_id=msg_id,
-                        disable_notification=True
-                    )
-                    
-                    # Удаляем скопированное сообщение
-                    try:
-                        await bot.delete_message(chat_id=channel_id, message_id=test_msg.message_id)
-                    except:
-                        pass
-                    
-                    logger.info(f"✅ Найдено сообщение {msg_id} в канале {channel_id}")
-                    valid_id = msg_id
-                    break  # Берем первое найденное сообщение при поиске назад
-                    
-                except Exception as e:
-                    error_text = str(e).lower()
-                    if any(phrase in error_text for phrase in [
-                        "message not found", 
-                        "message to copy not found",
-                        "message_id_invalid",
-                        "message to forward not found"
-                    ]):
-                        continue
-                    else:
-                        logger.debug(f"⚠️ Неожиданная ошибка при проверке сообщения {msg_id}: {e}")
-                        continue
+                if await probe(middle):
+                    low = middle
+                else:
+                    high = middle
+            
+            logger.debug("✅ Найдено сообщение {} в канале {}", low, channel_id)
+            valid_id = low
+            
+            # От сохраненного ID повторная проверка неизменного канала стоит двух запросов:
+            # опорное сообщение и следующий за ним промах
+            if last_saved_id and not scan_gaps:
+                break
+            # Промах может оказаться удаленным сообщением: конец канала - только после max_gap промахов подряд
+            low, probed = await _first_existing(probe, range(high + 1, high + max_gap))
+            checked_count += probed
         
         # Результат поиска
         if valid_id:
             logger.info(f"🎯 Найдено валидное сообщение (ID: {valid_id}) в канале {channel_id} после проверки {checked_count} сообщений")
+            if on_found is not None:
+                await on_found(valid_id)
             return valid_id
         else:
             logger.warning(f"❌ Не найдено валидных сообщений в канале {channel_id} после проверки {checked_count} сообщений")
             return None
             
+    except TelegramRetryAfter as e:
+        # Повтор тоже упал в флуд-контроль: промах засчитывать нельзя, иначе результат будет неверным
+        logger.warning(f"⏳ Лимит запросов Telegram при поиске в канале {channel_id}, поиск прерван (retry_after={e.retry_after})")
+        return None
+    except (TelegramForbiddenError, TelegramNotFound, TelegramBadRequest) as e:
+        # Бот удален из канала, канал не существует или владелец не запускал бота (заблокировал его) -
+        # остальные ID проверять бессмысленно; копировать в сам канал нельзя: копии увидят подписчики
+        logger.warning(
+            f"🚫 Нет доступа к каналу {channel_id} или чату владельца {owner_id}, поиск прерван "
+            f"(если недоступен чат владельца, ему нужно отправить боту /start): {e}"
+        )
+        return None
+    except _SearchAborted as e:
+        logger.warning(f"⚠️ Поиск в канале {channel_id} прерван: {e}")
+        return None
+    except Exception as e:
+        logger.opt(exception=True).error(f"❌ Критическая ошибка при поиске последнего сообщения в канале {channel_id}: {e}")
+        return None
+
+
+async def _copy_for_probe(bot: Bot, channel_id: str, message_id: int, probe_chat_id: Union[int, str]):
+    """copy_message под общими лимитами проверок; после RetryAfter - одна повторная попытка"""
+    for attempt in range(2):
+        async with _probe_semaphore:
+            await _probe_bucket.acquire()
+            try:
+                return await bot.copy_message(
+                    chat_id=probe_chat_id,
+                    from_chat_id=channel_id,
+                    message_id=message_id,
+                    disable_notification=True
+                )
+            except TelegramRetryAfter as e:
+                if attempt:
+                    raise
+                retry_after = e.retry_after
+        # Флуд-контроль: ждем, сколько просит Telegram, не занимая слот семафора
+        await asyncio.sleep(retry_after + 0.1)
+
+
+async def _probe(bot: Bot, channel_id: str, message_id: int, probe_chat_id: Union[int, str]) -> Optional[bool]:
+    """Проверка одного ID копированием в probe_chat_id с удалением копии.
+    
+    None - неожиданная ошибка; недоступный чат и повторный флуд-контроль пробрасываются.
+    """
+    try:
+        test_msg = await _copy_for_probe(bot, channel_id, message_id, probe_chat_id)
+    except TelegramBadRequest as e:
+        if _NOT_FOUND_RE.search(e.message):
+            return False
+        if _CHAT_NOT_FOUND_RE.search(e.message):
+            raise
+        logger.warning("Неожиданная ошибка при проверке сообщения {} в канале {}: {}", message_id, channel_id, e)
+        return None
+    except (TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter):
+        raise
     except Exception as e:
-        logger.error(f"❌ Критическая ошибка при поиске последнего сообщения в канале {channel_id}: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.warning("Неожиданная ошибка при проверке сообщения {} в канале {}: {}", message_id, channel_id, e)
         return None
+    
+    # Если успешно скопировали, сразу удаляем копию
+    try:
+        await bot.delete_message(chat_id=probe_chat_id, message_id=test_msg.message_id)
+    except Exception:
+        pass  # Игнорируем ошибки удаления
+    return True
 
 
 async def check_message_exists(bot: Bot, channel_id: str, message_id: int) -> bool:
@@ -150,32 +249,10 @@ async def check_message_exists(bot: Bot, channel_id: str, message_id: int) -> bo
         True если сообщение существует, False если нет
     """
     try:
-        # Пробуем скопировать сообщение в тот же канал для проверки существования
-        test_msg = await bot.copy_message(
-            chat_id=channel_id,
-            from_chat_id=channel_id, 
-            message_id=message_id,
-            disable_notification=True
-        )
-        
-        # Если успешно скопировали, сразу удаляем копию
-        try:
-            await bot.delete_message(chat_id=channel_id, message_id=test_msg.message_id)
-        except:
-            pass  # Игнорируем ошибки удаления
-            
-        return True
-        
-    except Exception as e:
-        error_text = str(e).lower()
-        if any(phrase in error_text for phrase in [
-            "message not found",
-            "message to copy not found", 
-            "message_id_invalid",
-            "message to forward not found"
-        ]):
-            return False
-        else:
-            # Неожиданная ошибка
-            logger.warning(f"Неожиданная ошибка при проверке сообщения {message_id} в канале {channel_id}: {e}")
-            return False
\ No newline at end of file
+        return bool(await _probe(bot, channel_id, message_id, probe_chat_id=channel_id))
+    except (TelegramForbiddenError, TelegramNotFound, TelegramBadRequest) as e:
+        logger.warning(f"Нет доступа к каналу {channel_id}: {e}")
+        return False
+    except TelegramRetryAfter as e:
+        logger.warning(f"Лимит запросов Telegram при проверке сообщения {message_id} в канале {channel_id}: {e}")
+        return False